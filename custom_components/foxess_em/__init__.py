@@ -18,8 +18,10 @@ from homeassistant.const import (
 from homeassistant.core import Config, HomeAssistant
 from homeassistant.helpers import config_validation
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+import voluptuous as vol
 
 from custom_components.foxess_em.battery.schedule import Schedule
+from custom_components.foxess_em.common.snapshot import Snapshot
 from custom_components.foxess_em.fox.fox_modbus import FoxModbus
 from custom_components.foxess_em.fox.fox_modbus_service import FoxModbuservice
 from custom_components.foxess_em.util.peak_period_util import PeakPeriodUtils
@@ -31,9 +33,11 @@ from .config_flow import BatteryManagerFlowHandler
 from .const import (
     AUX_POWER,
     BATTERY_CAPACITY,
+    BATTERY_REFRESH_INTERVAL,
     BATTERY_SOC,
     BATTERY_VOLTS,
     CHARGE_AMPS,
+    CHARGE_CONFIDENCE,
     CONNECTION_TYPE,
     DAWN_BUFFER,
     DAY_BUFFER,
@@ -48,22 +52,65 @@ from .const import (
     FOX_MODBUS_SLAVE,
     FOX_MODBUS_TCP,
     HOUSE_POWER,
+    LOAD_DAYS,
+    LOAD_STATISTICS,
+    LOAD_WEEKDAY_SPLIT,
     MIN_SOC,
+    MODBUS_PROXY_HOST,
+    MODBUS_PROXY_PORT,
     PLATFORMS,
     SOLCAST_API_KEY,
+    SOLCAST_API_LIMIT,
     SOLCAST_URL,
     STARTUP_MESSAGE,
+    TELEMETRY_DISABLED,
+    TELEMETRY_FAMILY,
+    TELEMETRY_INTERVAL,
     Connection,
 )
 from .forecast.forecast_controller import ForecastController
 from .forecast.solcast_api import SolcastApiClient
 from .fox.fox_cloud_api import FoxCloudApiClient
 from .fox.fox_cloud_service import FoxCloudService
+from .fox.modbus_proxy import ModbusProxy
+from .telemetry.telemetry_controller import TelemetryController
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
 CONFIG_SCHEMA = config_validation.config_entry_only_config_schema(DOMAIN)
 
+SIMULATE_SCHEMA = vol.Schema(
+    {
+        vol.Required("scenarios"): vol.All(
+            config_validation.ensure_list,
+            vol.Length(min=1, max=1000),
+            [
+                vol.Schema(
+                    {
+                        vol.Optional("boost"): vol.All(
+                            vol.Coerce(float), vol.Range(min=0, max=50)
+                        ),
+                        vol.Optional("full"): config_validation.boolean,
+                        vol.Optional("dawn_buffer"): vol.All(
+                            vol.Coerce(float), vol.Range(min=0, max=50)
+                        ),
+                        vol.Optional("day_buffer"): vol.All(
+                            vol.Coerce(float), vol.Range(min=0, max=50)
+                        ),
+                        vol.Optional("min_soc"): vol.All(
+                            vol.Coerce(float), vol.Range(min=10, max=99)
+                        ),
+                    }
+                )
+            ],
+        )
+    }
+)
+
+REFRESH_FORECAST_SCHEMA = vol.Schema(
+    {vol.Optional("estimated_actuals", default=False): config_validation.boolean}
+)
+
 
 async def async_setup(hass: HomeAssistant, config: Config):
     """Set up this integration using YAML is not supported."""
@@ -120,16 +167,65 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     fox_modbus_host = entry_data.get(FOX_MODBUS_HOST, "")
     fox_modbus_port = entry_data.get(FOX_MODBUS_PORT, 502)
     fox_modbus_slave = entry_data.get(FOX_MODBUS_SLAVE, 247)
+    # Added for 1.9.0
+    battery_refresh_interval = entry_data.get(BATTERY_REFRESH_INTERVAL, 10)
+    load_statistics = entry_data.get(LOAD_STATISTICS, False)
+    load_days = entry_data.get(LOAD_DAYS, 14)
+    load_weekday_split = entry_data.get(LOAD_WEEKDAY_SPLIT, False)
+    solcast_api_limit = entry_data.get(SOLCAST_API_LIMIT, 10)
+    charge_confidence = entry_data.get(CHARGE_CONFIDENCE, 90)
+    telemetry_family = entry_data.get(TELEMETRY_FAMILY, TELEMETRY_DISABLED)
+    telemetry_interval = entry_data.get(TELEMETRY_INTERVAL, 10)
+    modbus_proxy_host = entry_data.get(MODBUS_PROXY_HOST, "127.0.0.1")
+    modbus_proxy_port = entry_data.get(MODBUS_PROXY_PORT, 0)
 
     session = async_get_clientsession(hass)
     solcast_client = SolcastApiClient(solcast_api_key, SOLCAST_URL, session)
 
+    # Read the snapshot of the last models, keyed on their configuration
+    average_inputs = [
+        house_power,
+        aux_power,
+        load_statistics,
+        load_days,
+        load_weekday_split,
+    ]
+    forecast_inputs = [solcast_api_key]
+    battery_inputs = [
+        average_inputs,
+        forecast_inputs,
+        eco_start_time,
+        eco_end_time,
+        battery_soc,
+        user_min_soc,
+        capacity,
+        dawn_buffer,
+        day_buffer,
+    ]
+    snapshot = Snapshot(
+        hass,
+        entry.entry_id,
+        {
+            "average": average_inputs,
+            "forecast": forecast_inputs,
+            "battery": battery_inputs,
+        },
+    )
+    await snapshot.async_load()
+
     # Initialise controllers and services
     peak_utils = PeakPeriodUtils(eco_start_time, eco_end_time)
 
-    forecast_controller = ForecastController(hass, solcast_client)
+    forecast_controller = ForecastController(hass, solcast_client, solcast_api_limit)
     average_controller = AverageController(
-        hass, eco_start_time, eco_end_time, house_power, aux_power
+        hass,
+        eco_start_time,
+        eco_end_time,
+        house_power,
+        aux_power,
+        load_statistics,
+        load_days,
+        load_weekday_split,
     )
     schedule = Schedule(hass)
     battery_controller = BatteryController(
@@ -144,9 +240,23 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
         battery_soc,
         schedule,
         peak_utils,
+        battery_refresh_interval,
+        charge_confidence,
+    )
+
+    # Serve the snapshot until the first refresh, before any refresh can run
+    snapshot.restore(
+        {
+            "average": average_controller,
+            "forecast": forecast_controller,
+            "battery": battery_controller,
+        }
     )
 
     _LOGGER.debug(f"Initialising {connection_type} service")
+    modbus_client = None
+    modbus_proxy = None
+    telemetry_controller = None
     if connection_type == FOX_CLOUD:
         cloud_client = FoxCloudApiClient(session, fox_api_key)
         fox_service = FoxCloudService(
@@ -167,6 +277,22 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
             eco_end_time,
             user_min_soc,
         )
+        if telemetry_family != TELEMETRY_DISABLED:
+            telemetry_controller = TelemetryController(
+                hass,
+                modbus_client,
+                fox_modbus_slave,
+                telemetry_family,
+                telemetry_interval,
+            )
+            battery_controller.set_soc_source(telemetry_controller.battery_soc)
+        if modbus_proxy_port > 0:
+            modbus_proxy = ModbusProxy(
+                hass, modbus_client, modbus_proxy_host, modbus_proxy_port
+            )
+            # settings written by other clients are re-read before writing
+            modbus_proxy.add_write_listener(fox_service.invalidate_shadow)
+            await modbus_proxy.async_start()
 
     charge_service = ChargeService(
         hass,
@@ -180,6 +306,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
         user_min_soc,
         charge_amps,
         battery_volts,
+        telemetry_controller,
     )
 
     hass.data[DOMAIN][entry.entry_id] = {
@@ -188,6 +315,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
             "battery": battery_controller,
             "forecast": forecast_controller,
             "charge": charge_service,
+            "snapshot": snapshot,
         },
         "config": {
             "connection": (
@@ -196,11 +324,19 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
                 else Connection.CLOUD
             )
         },
+        "modbus": modbus_client,
+        "modbus_proxy": modbus_proxy,
     }
+    if telemetry_controller is not None:
+        controllers = hass.data[DOMAIN][entry.entry_id]["controllers"]
+        controllers["telemetry"] = telemetry_controller
 
     # Add callbacks into battery controller for updates
     forecast_controller.add_update_listener(battery_controller)
     average_controller.add_update_listener(battery_controller)
+    battery_controller.add_update_listener(snapshot)
+    if telemetry_controller is not None:
+        telemetry_controller.add_soc_listener(battery_controller.refresh)
 
     hass.services.async_register(
         DOMAIN, "start_force_charge_now", fox_service.start_force_charge_now
@@ -214,6 +350,23 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     hass.services.async_register(
         DOMAIN, "clear_schedule", battery_controller.clear_schedule
     )
+    hass.services.async_register(
+        DOMAIN,
+        "refresh_forecast",
+        forecast_controller.async_refresh_forecast,
+        schema=REFRESH_FORECAST_SCHEMA,
+    )
+    if HA_MAJOR_VERSION > 2023 or (HA_MAJOR_VERSION == 2023 and HA_MINOR_VERSION >= 7):
+        # 2023.7 adds responses to service calls
+        from homeassistant.core import SupportsResponse
+
+        hass.services.async_register(
+            DOMAIN,
+            "simulate",
+            battery_controller.async_simulate,
+            schema=SIMULATE_SCHEMA,
+            supports_response=SupportsResponse.ONLY,
+        )
 
     hass.data[DOMAIN][entry.entry_id]["unload"] = entry.add_update_listener(
         async_reload_entry
@@ -241,6 +394,10 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             controller.unload()
 
         hass.data[DOMAIN][entry.entry_id]["unload"]()
+        if hass.data[DOMAIN][entry.entry_id]["modbus_proxy"] is not None:
+            await hass.data[DOMAIN][entry.entry_id]["modbus_proxy"].async_stop()
+        if hass.data[DOMAIN][entry.entry_id]["modbus"] is not None:
+            await hass.data[DOMAIN][entry.entry_id]["modbus"].close()
         hass.data[DOMAIN].pop(entry.entry_id)
 
     return unloaded
@@ -1,10 +1,11 @@
 """Average controller"""
 
-from datetime import datetime, time, timedelta
+from datetime import datetime, time, timedelta, timezone
 import logging
 
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.event import async_track_utc_time_change
+import numpy as np
 from pandas import DataFrame
 
 from custom_components.foxess_em.common.hass_load_controller import HassLoadController
@@ -27,21 +28,30 @@ class AverageController(UnloadController, CallbackController, HassLoadController
         eco_end_time: time,
         house_power: str,
         aux_power: list[str],
+        statistics: bool = False,
+        statistics_days: int = 14,
+        weekday_split: bool = False,
     ) -> None:
         self._hass = hass
         self._last_update = None
 
+        # long-term statistics are cheap enough to cover several weeks
+        period = timedelta(days=statistics_days if statistics else 2)
         entities = {
             "house_load_7d": TrackedSensor(
-                HistorySensor(house_power, timedelta(days=2), False),
-                [
-                    HistorySensor(sensor, timedelta(days=2), False)
-                    for sensor in aux_power
-                ],
+                HistorySensor(house_power, period, False),
+                [HistorySensor(sensor, period, False) for sensor in aux_power],
             )
         }
 
-        self._model = AverageModel(hass, entities, eco_start_time, eco_end_time)
+        self._model = AverageModel(
+            hass,
+            entities,
+            eco_start_time,
+            eco_end_time,
+            statistics,
+            weekday_split,
+        )
 
         # Setup mixins
         UnloadController.__init__(self)
@@ -72,10 +82,31 @@ class AverageController(UnloadController, CallbackController, HassLoadController
         _LOGGER.debug("Finished refreshing averages model, notifying listeners")
         self._notify_listeners()
 
+    def snapshot(self) -> dict[str, np.ndarray] | None:
+        """Resampled load for the snapshot"""
+        if not self.ready():
+            return None
+
+        return {
+            **self._model.snapshot(),
+            "last_update": np.array(self._last_update.timestamp()),
+        }
+
+    def restore(self, arrays: dict[str, np.ndarray]) -> None:
+        """Restore resampled load from a snapshot"""
+        self._model.restore(arrays)
+        self._last_update = datetime.fromtimestamp(
+            arrays["last_update"], timezone.utc
+        ).astimezone()
+
     def resample_data(self) -> DataFrame:
         """Return resampled data"""
         return self._model.resample_data()
 
+    def version(self) -> int:
+        """Load profile version"""
+        return self._model.version()
+
     def average_all_house_load(self) -> float:
         """Average daily house load"""
         return self._model.average_all_house_load()
@@ -1,14 +1,17 @@
 """Average model"""
 
-from datetime import datetime, time
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
 import logging
 
 from dateutil import tz
-from homeassistant.components.recorder import get_instance, history
+from homeassistant.components.recorder import get_instance, history, statistics
 from homeassistant.core import HomeAssistant
+import numpy as np
 import pandas as pd
 
 from ..util.exceptions import NoDataError
+from ..util.peak_period_util import PeakPeriodUtils
 from .tracked_sensor import HistorySensor, TrackedSensor
 
 _LOGGER = logging.getLogger(__name__)
@@ -23,11 +26,16 @@ class AverageModel:
         entities: dict[str, TrackedSensor],
         eco_start_time: time,
         eco_end_time: time,
+        statistics: bool = False,
+        weekday_split: bool = False,
     ) -> None:
         self._hass = hass
         self._tracked_sensors = entities
+        self._statistics = statistics
+        self._weekday_split = weekday_split
         self._resampled = {}
         self._ready = False
+        self._version = 0
         self._eco_start_time = eco_start_time
         self._eco_end_time = eco_end_time
 
@@ -35,72 +43,137 @@ class AverageModel:
         """Model status"""
         return self._ready
 
+    def version(self) -> int:
+        """Incremented whenever the load profile changes"""
+        return self._version
+
     async def refresh(self) -> None:
         """Refresh historical data"""
-        # refresh all
-        for sensor in self._tracked_sensors:
-            await self._update_history(self._tracked_sensors[sensor])
-
-        self._resampled = self._house_load_resample()
-        self._ready = True
+        if self._statistics:
+            resampled = await self._statistics_resample()
+        else:
+            # refresh all
+            items = [
+                item
+                for sensor in self._tracked_sensors.values()
+                for item in [sensor.primary, *sensor.secondary]
+            ]
+            await self._update_items(items)
+            resampled = self._house_load_resample()
+
+        self._set_resampled(resampled)
+
+    def snapshot(self) -> dict[str, np.ndarray]:
+        """Resampled load for the snapshot"""
+        epoch = self._resampled["datetime"].to_numpy(dtype="datetime64[ns]")
+
+        return {
+            "minute": epoch.astype("int64") // (60 * 10**9),
+            "load": self._resampled["load"].to_numpy(),
+        }
 
-    async def _update_history(self, sensor: TrackedSensor) -> None:
-        """Update history values"""
+    def restore(self, arrays: dict[str, np.ndarray]) -> None:
+        """Restore resampled load from a snapshot"""
+        self._set_resampled(self._load_frame(arrays["minute"], arrays["load"], []))
 
-        await self._update_item(sensor.primary)
+    def _set_resampled(self, resampled: pd.DataFrame) -> None:
+        """Replace the resampled load"""
+        if self._weekday_split:
+            epoch = resampled["datetime"].to_numpy(dtype="datetime64[ns]")
+            resampled["weekend"] = PeakPeriodUtils.local_weekend(
+                epoch.astype("int64") // 10**9
+            )
 
-        for item in sensor.secondary:
-            await self._update_item(item)
+        self._resampled = resampled
+        self._version += 1
+        self._ready = True
 
-    async def _update_item(self, item: HistorySensor) -> None:
-        """Retrieve values from HA"""
+    async def _update_items(self, items: list[HistorySensor]) -> None:
+        """Retrieve new values from HA, since the last refresh of each item"""
         recorder = get_instance(self._hass)
 
-        to_date = datetime.now().astimezone()
+        windows = {}
+        for item in items:
+            to_date = datetime.now().astimezone()
 
-        if item.whole_day:
-            to_date = (
-                datetime.now()
-                .astimezone()
-                .replace(hour=0, minute=0, second=0, microsecond=0)
-                .astimezone(tz.UTC)
-            )
+            if item.whole_day:
+                to_date = (
+                    datetime.now()
+                    .astimezone()
+                    .replace(hour=0, minute=0, second=0, microsecond=0)
+                    .astimezone(tz.UTC)
+                )
 
-        from_date = to_date - item.period
+            from_date = to_date - item.period
+            fetch_from = from_date
+            if item.watermark is not None and item.watermark > from_date:
+                fetch_from = item.watermark
 
+            windows[item.sensor_name] = (from_date, fetch_from, to_date)
+
+        # query every entity at once, from the oldest watermark
         history_list = await recorder.async_add_executor_job(
-            history.state_changes_during_period,
-            self._hass,
-            from_date,
-            to_date,
-            str(item.sensor_name),
+            self._state_changes,
+            min(window[1] for window in windows.values()),
+            max(window[2] for window in windows.values()),
+            list(windows),
         )
 
-        values = history_list.get(item.sensor_name)
+        for item in items:
+            from_date, fetch_from, to_date = windows[item.sensor_name]
+            self._ingest(
+                item, history_list.get(item.sensor_name, []), fetch_from, to_date
+            )
 
-        values_dict = [
-            {
-                "datetime": value.last_changed.astimezone(tz.UTC),
-                "value": float(value.state),
-            }
-            for value in values
-            if value.state not in ("", "unknown", "unavailable")
-        ]
+            # evict values which have dropped out of the window
+            first = bisect_right(
+                item.events, from_date.astimezone(tz.UTC), key=lambda x: x["datetime"]
+            )
+            del item.events[:first]
+
+            # Add start/final value to ensure even resampling later
+            item.values = [
+                {"datetime": from_date.astimezone(tz.UTC), "value": 0},
+                *item.events,
+                {
+                    "datetime": to_date.astimezone(tz.UTC),
+                    "value": item.events[-1]["value"] if item.events else 0,
+                },
+            ]
+
+    def _state_changes(
+        self, start: datetime, end: datetime, entity_ids: list[str]
+    ) -> dict[str, list]:
+        """State changes of all entities, runs in the recorder executor"""
+        return history.get_significant_states(
+            self._hass,
+            start,
+            end,
+            entity_ids,
+            include_start_time_state=False,
+            significant_changes_only=True,
+        )
 
-        # Add start/final value to ensure even resampling later
-        values_dict[0] = {
-            "datetime": from_date.astimezone(tz.UTC),
-            "value": 0,
-        }
+    def _ingest(
+        self, item: HistorySensor, values: list, fetch_from: datetime, to_date: datetime
+    ) -> None:
+        """Append state changes after the watermark"""
+        last = fetch_from.astimezone(tz.UTC)
+        if item.events and item.events[-1]["datetime"] > last:
+            last = item.events[-1]["datetime"]
 
-        values_dict.append(
-            {
-                "datetime": to_date.astimezone(tz.UTC),
-                "value": values_dict[-1]["value"],
-            }
-        )
+        for value in values:
+            changed = value.last_changed.astimezone(tz.UTC)
+            if changed <= last or changed >= to_date:
+                continue
+            if value.state in ("", "unknown", "unavailable"):
+                continue
+
+            item.events.append({"datetime": changed, "value": float(value.state)})
+            last = changed
 
-        item.values = values_dict
+        # states the recorder has yet to commit are picked up by the next fetch
+        item.watermark = last
 
     def resample_data(self) -> pd.DataFrame:
         """Return resampled data"""
@@ -110,30 +183,154 @@ class AverageModel:
 
     def _house_load_resample(self) -> pd.DataFrame:
         """Resample house load and deduct secondary sensors"""
-        house_load_values = self._tracked_sensors["house_load_7d"].primary.values
-        house_load_resample = self._resample_data(house_load_values)
+        house_load = self._tracked_sensors["house_load_7d"]
+        minutes, load = self._resample_data(house_load.primary.values)
 
-        for aux in self._tracked_sensors["house_load_7d"].secondary:
-            aux_load_resample = self._resample_data(aux.values)
-            aux_load_resample["load"] = aux_load_resample["load"] / 1000
-            house_load_resample["load"] -= aux_load_resample["load"]
+        # align aux sensors to the house load minutes and deduct them together
+        aux_load = [
+            self._resample_data(aux.values, minutes)[1] for aux in house_load.secondary
+        ]
 
-        return house_load_resample
+        return self._load_frame(minutes, load, aux_load)
+
+    async def _statistics_resample(self) -> pd.DataFrame:
+        """Resample house load from long-term statistics"""
+        house_load = self._tracked_sensors["house_load_7d"]
+        recorder = get_instance(self._hass)
 
-    def _resample_data(self, values) -> pd.DataFrame:
-        """Resample values"""
-        df = pd.DataFrame.from_dict(values)
+        to_date = datetime.now().astimezone().replace(second=0, microsecond=0)
+        to_date -= timedelta(minutes=to_date.minute % 5)
+        from_date = to_date - house_load.primary.period
+        minutes = np.arange(
+            int(from_date.timestamp()) // 60, int(to_date.timestamp()) // 60
+        )
+
+        hourly, five_minute = await recorder.async_add_executor_job(
+            self._statistics_during_period,
+            from_date,
+            to_date,
+            [item.sensor_name for item in [house_load.primary, *house_load.secondary]],
+        )
 
-        df = df.set_index("datetime").resample("1s").ffill().resample("1Min").mean()
+        load, *aux_load = [
+            self._statistics_minutes(
+                hourly.get(item.sensor_name, []),
+                five_minute.get(item.sensor_name, []),
+                minutes,
+            )
+            for item in [house_load.primary, *house_load.secondary]
+        ]
 
-        df = df.rename(columns={"value": "load"})
-        df["load"] = df["load"] / 60
+        if np.isnan(load).all():
+            _LOGGER.warning(
+                f"No long-term statistics for {house_load.primary.sensor_name}, "
+                "using state history"
+            )
+            await self._update_items([house_load.primary, *house_load.secondary])
+            return self._house_load_resample()
+
+        return self._load_frame(minutes, load, aux_load)
+
+    def _statistics_during_period(
+        self, start: datetime, end: datetime, statistic_ids: list[str]
+    ) -> tuple[dict, dict]:
+        """Hourly and 5 minute mean statistics, runs in the recorder executor"""
+        return tuple(
+            statistics.statistics_during_period(
+                self._hass,
+                start,
+                end,
+                statistic_ids=set(statistic_ids),
+                period=period,
+                units=None,
+                types={"mean"},
+            )
+            for period in ("hour", "5minute")
+        )
 
+    def _statistics_minutes(
+        self, hourly: list[dict], five_minute: list[dict], minutes: np.ndarray
+    ) -> np.ndarray:
+        """Spread statistics means across minutes, preferring 5 minute rows"""
+        means = np.full(len(minutes), np.nan)
+
+        for rows, length in ((hourly, 60), (five_minute, 5)):
+            rows = [row for row in rows if row.get("mean") is not None]
+            if len(rows) == 0:
+                continue
+
+            # row starts are datetimes on older versions of HA
+            starts = np.array(
+                [
+                    (
+                        row["start"].timestamp()
+                        if isinstance(row["start"], datetime)
+                        else row["start"]
+                    )
+                    for row in rows
+                ]
+            )
+            first = starts.astype("int64") // 60 - minutes[0]
+            positions = (first[:, None] + np.arange(length)).ravel()
+            values = np.repeat([row["mean"] for row in rows], length)
+
+            valid = (positions >= 0) & (positions < len(minutes))
+            means[positions[valid]] = values[valid]
+
+        return means / 60
+
+    def _load_frame(
+        self, minutes: np.ndarray, load: np.ndarray, aux_load: list[np.ndarray]
+    ) -> pd.DataFrame:
+        """Build the load frame, deducting aux sensors (W)"""
+        if len(aux_load) > 0:
+            # aux sensors without readings for a minute deduct nothing
+            load = load - (np.nansum(aux_load, axis=0) / 1000)
+
+        df = pd.DataFrame(
+            {"load": load},
+            index=pd.DatetimeIndex(minutes * 60 * 10**9, tz="UTC", name="datetime"),
+        )
         df["datetime"] = pd.to_datetime(df.index.values, utc=True)
         df["time"] = df.datetime.dt.time
 
         return df
 
+    def _resample_data(
+        self, values: list[dict], minutes: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Time weighted minute averages of state changes
+
+        Each value is held from the second after it changes until the next
+        change, minutes without any held values are NaN.
+        """
+        epoch = pd.DatetimeIndex([value["datetime"] for value in values])
+        epoch = epoch.to_numpy(dtype="datetime64[ns]").astype("int64")
+        states = np.array([value["value"] for value in values], dtype=float)
+
+        # seconds a value first applies from, the latest change in a second wins
+        seconds = -(-epoch // 10**9)
+        latest = np.append(seconds[1:] != seconds[:-1], True)
+        seconds = seconds[latest]
+        states = states[latest]
+        end = epoch[-1] // 10**9 + 1
+
+        if minutes is None:
+            minutes = np.arange(epoch[0] // 10**9 // 60, (end - 1) // 60 + 1)
+
+        # integral of the held values at each minute boundary
+        durations = np.diff(np.append(seconds, end))
+        integral = np.concatenate(([0], np.cumsum(states * durations)))
+        bounds = np.clip(np.append(minutes, minutes[-1] + 1) * 60, seconds[0], end)
+        position = np.searchsorted(seconds, bounds, side="right") - 1
+        totals = integral[position] + states[position] * (bounds - seconds[position])
+
+        counts = np.diff(bounds)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, np.diff(totals) / counts, np.nan)
+
+        return minutes, means / 60
+
     def average_all_house_load(self) -> float:
         """House load today"""
         days = self._tracked_sensors["house_load_7d"].primary.period.days
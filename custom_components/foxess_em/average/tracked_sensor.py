@@ -1,7 +1,7 @@
 """Tracked sensor data model"""
 
-from dataclasses import dataclass
-from datetime import timedelta
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 
 
 @dataclass
@@ -12,6 +12,8 @@ class HistorySensor:
     period: timedelta
     whole_day: bool | None = False
     values: list[dict] | None = None
+    events: list[dict] = field(default_factory=list)
+    watermark: datetime | None = None
 
 
 @dataclass
@@ -0,0 +1,51 @@
+"""Batch battery simulation"""
+
+import logging
+
+import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class BatchSimulation:
+    """Battery simulation stepped over time for many scenarios at once"""
+
+    def __init__(self, capacity: np.ndarray) -> None:
+        """Init with the available capacity of each scenario"""
+        self._capacity = capacity
+
+    def run(
+        self,
+        battery: np.ndarray,
+        delta: np.ndarray,
+        hold: np.ndarray,
+        min_soc: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Simulate battery and grid values, one column per scenario
+
+        The delta is shared by all scenarios, or has a column per scenario.
+        Scenarios with a NaN minimum SoC are never held, grid values are NaN
+        where the battery is held at the minimum SoC.
+        """
+        size = len(delta)
+        battery_path = np.empty((size, len(battery)))
+        grid = np.empty((size, len(battery)))
+
+        battery = battery.copy()
+        deltas = delta.tolist() if delta.ndim == 1 else delta
+        for step, (period_delta, period_hold) in enumerate(zip(deltas, hold.tolist())):
+            if period_hold:
+                held = battery < min_soc
+
+            new_state = battery + period_delta
+            limit = (new_state <= 0) | (new_state >= self._capacity)
+            np.clip(new_state, 0, self._capacity, out=battery)
+            grid[step] = np.where(limit, period_delta, 0)
+
+            if period_hold and held.any():
+                battery[held] = min_soc[held]
+                grid[step, held] = np.nan
+
+            battery_path[step] = battery
+
+        return battery_path, grid
@@ -1,14 +1,20 @@
 """Battery controller"""
 
-from datetime import datetime, time
+from datetime import datetime, time, timezone
+import json
 import logging
+from typing import Callable
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.json import JSONEncoder
+import numpy as np
 
 from custom_components.foxess_em.battery.battery_util import BatteryUtils
 from custom_components.foxess_em.battery.schedule import Schedule
 from custom_components.foxess_em.common.hass_load_controller import HassLoadController
+from custom_components.foxess_em.common.refresh_scheduler import RefreshScheduler
 from custom_components.foxess_em.util.peak_period_util import PeakPeriodUtils
 
 from ..average.average_controller import AverageController
@@ -37,6 +43,8 @@ class BatteryController(UnloadController, CallbackController, HassLoadController
         battery_soc: str,
         schedule: Schedule,
         peak_utils: PeakPeriodUtils,
+        refresh_interval: float,
+        charge_confidence: float,
     ) -> None:
         self._hass = hass
         self._schedule = schedule
@@ -54,15 +62,25 @@ class BatteryController(UnloadController, CallbackController, HassLoadController
             schedule,
             peak_utils,
             self._battery_utils,
+            charge_confidence / 100,
         )
+        self._charge_confidence = charge_confidence
         self._forecast_controller = forecast_controller
         self._average_controller = average_controller
         self._last_update = None
+        self._scheduler = RefreshScheduler(
+            hass,
+            "foxess_em_battery",
+            self._refresh,
+            self._refresh_done,
+            refresh_interval,
+        )
 
         # Setup mixins
         UnloadController.__init__(self)
         CallbackController.__init__(self)
         HassLoadController.__init__(self, hass, self.async_refresh)
+        self._unload_listeners.append(self._scheduler.stop)
 
         # Refresh on SoC change
         battery_refresh = async_track_state_change_event(
@@ -74,31 +92,56 @@ class BatteryController(UnloadController, CallbackController, HassLoadController
         """Model status"""
         return self._model.ready()
 
+    def set_soc_source(self, source: Callable[[], float | None]) -> None:
+        """Read the SoC from the inverter rather than the battery SoC sensor"""
+        self._model.set_soc_source(source)
+
     async def async_refresh(self, *args) -> None:
         """Async refresh"""
         self.refresh()
 
+    @callback
     def refresh(self, *args) -> None:  # pylint: disable=unused-argument
-        """Refresh battery model"""
+        """Schedule a battery model refresh"""
+        self._scheduler.request()
+
+    async def async_refresh_now(self) -> None:
+        """Refresh the battery model straight away and wait for it"""
+        await self._scheduler.async_run_now()
+
+    def _refresh(self) -> bool:
+        """Refresh battery model, runs in the refresh worker thread"""
         _LOGGER.debug("Refreshing battery model")
 
         if not (self._average_controller.ready() and self._forecast_controller.ready()):
-            return
+            return False
 
         try:
             load = self._average_controller.resample_data()
             forecast = self._forecast_controller.resample_data()
-            self._model.refresh_battery_model(forecast, load)
+            inputs_version = (
+                self._forecast_controller.version(),
+                self._average_controller.version(),
+            )
+            self._model.refresh_battery_model(forecast, load, inputs_version)
 
             self._last_update = datetime.now().astimezone()
-
-            _LOGGER.debug("Finished refreshing battery model, notifying listeners")
-            self._notify_listeners()
+            return True
         except NoDataError as ex:
             _LOGGER.warning(ex)
         except Exception as ex:
             _LOGGER.error(f"{ex!r}")
 
+        return False
+
+    @callback
+    def _refresh_done(self, refreshed: bool) -> None:
+        """Notify listeners on the event loop"""
+        if refreshed:
+            _LOGGER.debug("Finished refreshing battery model, notifying listeners")
+            self._notify_listeners()
+
+    @callback
     def update_callback(self) -> None:
         """Schedule a refresh"""
         self.refresh()
@@ -124,6 +167,25 @@ class BatteryController(UnloadController, CallbackController, HassLoadController
         """Return raw data in dictionary form"""
         return self._model.raw_data()
 
+    def snapshot(self) -> dict[str, np.ndarray] | None:
+        """Battery model and schedule for the snapshot"""
+        if not self.ready() or self._last_update is None:
+            return None
+
+        return {
+            **self._model.snapshot(),
+            "schedule": np.array(json.dumps(self._schedule.get_all(), cls=JSONEncoder)),
+            "last_update": np.array(self._last_update.timestamp()),
+        }
+
+    def restore(self, arrays: dict[str, np.ndarray]) -> None:
+        """Restore the battery model and schedule from a snapshot"""
+        self._schedule.restore(json.loads(arrays["schedule"]))
+        self._model.restore(arrays)
+        self._last_update = datetime.fromtimestamp(
+            arrays["last_update"], timezone.utc
+        ).astimezone()
+
     def state_at_eco_start(self) -> float:
         """Battery state at start of eco period"""
         return round(self._schedule_info()["battery"], 2)
@@ -144,6 +206,7 @@ class BatteryController(UnloadController, CallbackController, HassLoadController
         """Total kWh needed in the battery"""
         return self._schedule_info()["min_soc"]
 
+    @callback
     def clear_schedule(self, *args) -> None:
         """Clear schedule"""
         self._schedule.clear()
@@ -177,6 +240,18 @@ class BatteryController(UnloadController, CallbackController, HassLoadController
         """Forecast last update in ISO format"""
         return self._forecast_controller.last_update().isoformat()
 
+    def refresh_count(self) -> int:
+        """Number of battery model refreshes"""
+        return self._scheduler.refresh_count()
+
+    def coalesced_count(self) -> int:
+        """Number of refresh triggers coalesced into another refresh"""
+        return self._scheduler.coalesced_count()
+
+    def max_loop_block(self) -> float:
+        """Worst case event loop blocking time of a refresh (ms)"""
+        return self._scheduler.max_loop_block()
+
     def set_boost(self, value: float) -> None:
         """Set boost on/off"""
         self._schedule.upsert(
@@ -207,9 +282,28 @@ class BatteryController(UnloadController, CallbackController, HassLoadController
 
         return 0
 
+    async def async_simulate(self, call: ServiceCall) -> dict:
+        """Project candidate boost, buffer and min SoC settings"""
+        if not self.ready():
+            raise HomeAssistantError("Battery model is not ready")
+
+        try:
+            # on the refresh worker, so the model never changes mid-simulation
+            results = await self._scheduler.async_run_job(
+                self._model.simulate, call.data["scenarios"]
+            )
+        except NoDataError as ex:
+            raise HomeAssistantError(ex.message) from ex
+
+        return {"scenarios": results}
+
     def battery_depleted(self) -> datetime:
         """Time battery capacity is 0"""
-        return self._model.battery_depleted_time()
+        try:
+            return self._model.battery_depleted_time()
+        except NoDataError:
+            # SoC may not be available yet when restored from a snapshot
+            return None
 
     def peak_grid_import(self) -> float:
         """Grid import to next eco start"""
@@ -219,6 +313,32 @@ class BatteryController(UnloadController, CallbackController, HassLoadController
         """Grid export to next eco start"""
         return self._model.peak_grid_export()
 
+    def import_probability(self) -> int | None:
+        """Probability (%) of grid import before the next eco start"""
+        try:
+            return round(self._model.import_probability() * 100)
+        except NoDataError:
+            # no ensemble until the first refresh after a snapshot restore
+            return None
+
+    def expected_import(self) -> float | None:
+        """Mean grid import across PV scenarios before the next eco start"""
+        try:
+            return round(self._model.expected_import(), 2)
+        except NoDataError:
+            return None
+
+    def confident_charge_total(self) -> float | None:
+        """Charge needed at the next eco start at the chosen confidence"""
+        try:
+            return round(self._model.confident_charge_total(), 2)
+        except NoDataError:
+            return None
+
+    def charge_confidence(self) -> float:
+        """Chosen confidence (%) of the charge needed"""
+        return self._charge_confidence
+
     def empty(self) -> int:
         """Hack for hidden sensors"""
         return 0
@@ -1,19 +1,29 @@
 """Battery model"""
 
-from datetime import datetime, time, timedelta
+from datetime import datetime, time, timedelta, timezone
 import json
 import logging
+from typing import Callable
 
 from homeassistant.core import HomeAssistant
+import numpy as np
 import pandas as pd
 
+from custom_components.foxess_em.battery.batch_simulation import BatchSimulation
+from custom_components.foxess_em.battery.battery_simulation import BatterySimulation
 from custom_components.foxess_em.battery.battery_util import BatteryUtils
+from custom_components.foxess_em.battery.model_inputs import ModelInputs
+from custom_components.foxess_em.battery.model_store import ModelStore
 from custom_components.foxess_em.battery.schedule import Schedule
+from custom_components.foxess_em.battery.window_index import WindowIndex
 from custom_components.foxess_em.util.peak_period_util import PeakPeriodUtils
 
 from ..util.exceptions import NoDataError
 
 _LOGGER = logging.getLogger(__name__)
+_HISTORY_MINUTES = 3 * 24 * 60
+_ENSEMBLE_SIZE = 40
+_IMPORT_THRESHOLD = 0.01
 
 
 class BatteryModel:
@@ -31,9 +41,15 @@ class BatteryModel:
         schedule: Schedule,
         peak_utils: PeakPeriodUtils,
         battery_utils: BatteryUtils,
+        charge_confidence: float,
     ) -> None:
         self._hass = hass
-        self._model = None
+        self._model = ModelStore(_HISTORY_MINUTES)
+        self._index = None
+        self._inputs = None
+        self._ensemble = None
+        self._charge_confidence = charge_confidence
+        self._last_refresh = None
         self._ready = False
         self._min_soc = min_soc
         self._capacity = capacity
@@ -41,6 +57,7 @@ class BatteryModel:
         self._day_buffer = day_buffer
         self._eco_start_time = eco_start_time
         self._battery_soc = battery_soc
+        self._soc_source = None
         self._schedule = schedule
         self._peak_utils = peak_utils
         self._battery_utils = battery_utils
@@ -49,127 +66,214 @@ class BatteryModel:
         """Model status"""
         return self._ready
 
+    def set_soc_source(self, source: Callable[[], float | None]) -> None:
+        """Read the SoC from a source other than the battery SoC sensor"""
+        self._soc_source = source
+
     def raw_data(self):
         """Return raw data in dictionary form"""
         now = datetime.now().astimezone()
 
-        filtered = self._model[
-            ["period_start", "pv_estimate", "load", "battery", "grid"]
-        ]
-
-        filtered = filtered.set_index("period_start").resample("5Min").mean()
-        filtered["period_start"] = pd.to_datetime(filtered.index.values, utc=True)
-
-        hist = filtered[filtered["period_start"] <= now]
-        future = filtered[filtered["period_start"] > now]
-
-        raw_data = {
-            "history": json.loads(hist.to_json(orient="records")),
-            "forecast": json.loads(future.to_json(orient="records")),
-        }
+        return json.dumps(self._model.raw_data(now))
 
-        return json.dumps(raw_data)
+    def refresh_battery_model(
+        self,
+        forecast: pd.DataFrame,
+        load: pd.DataFrame,
+        inputs_version: tuple | None = None,
+    ) -> None:
+        """Calculate battery model
 
-    def refresh_battery_model(self, forecast: pd.DataFrame, load: pd.DataFrame) -> None:
-        """Calculate battery model"""
+        Merged inputs are reused whilst inputs_version is unchanged, so a SoC
+        change only re-simulates the battery from now.
+        """
         now = datetime.now().astimezone()
 
-        load_forecast = self._merge_dataframes(load, forecast)
+        battery = self._battery_capacity_remaining()
+        soc = battery
 
-        if self._model is None:
-            self._model = load_forecast
+        inputs = self._inputs
+        if inputs is None or inputs_version is None or inputs.version != inputs_version:
+            inputs = self._prepare_inputs(forecast, load, inputs_version)
 
-        load_forecast = load_forecast.sort_values(by="period_start")
+        minute = inputs.minute
+        first = int(np.searchsorted(minute, ModelStore.epoch_minute(now), "right"))
 
-        future = load_forecast[load_forecast["period_start"] > now]
+        refresh_version = (inputs_version, self._schedule.version(), soc, first)
+        if inputs_version is not None and refresh_version == self._last_refresh:
+            _LOGGER.debug("Battery model inputs unchanged, skipping refresh")
+            return
+
+        index = inputs.index.copy()
+        seconds = inputs.seconds
+        peak = inputs.peak
+        delta = inputs.delta
 
         available_capacity = self._capacity - (self._min_soc * self._capacity)
 
-        battery = self._battery_capacity_remaining()
+        min_soc = None
         last_schedule = self._schedule.get(self._peak_utils.last_eco_start(now))
         if last_schedule is not None:
             # grab the min soc from the last eco start calc, including boost
             min_soc = last_schedule["min_soc"]
         elif self._peak_utils.in_peak(now.time()):
             # no history and in an eco period, recalulate without knowing boost
-            _, min_soc = self._charge_totals(load_forecast, now, battery)
+            _, min_soc = self._charge_totals(index, now, battery)
 
-        for index, _ in future.iterrows():
-            period = (
-                load_forecast.iloc[index]["period_start"].to_pydatetime().astimezone()
-            )
-            if period.time() == self._eco_start_time:
+        eco_starts = first + np.flatnonzero(
+            seconds[first:] == self._peak_utils.eco_start_seconds()
+        )
+        hold_soc = min_soc
+
+        battery_values = np.full(len(minute), np.nan)
+        grid_values = np.full(len(minute), np.nan)
+        simulation = BatterySimulation(available_capacity)
+        boundaries = np.unique(np.concatenate(([first], eco_starts, [len(minute)])))
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            if start in eco_starts:
                 # landed on the start of the eco period
+                period = self._period_start(minute[start])
                 boost = self._get_total_additional_charge(period)
-                total, min_soc = self._charge_totals(
-                    load_forecast, period, battery, boost
-                )
+                total, min_soc = self._charge_totals(index, period, battery, boost)
                 battery += total
-            elif self._peak_utils.in_peak(period.time()) and battery < min_soc:
-                # hold SoC in off-peak period
-                battery = min_soc
-            else:
-                delta = load_forecast.iloc[index]["delta"]
-                new_state = battery + delta
-                battery = max([0, min([available_capacity, new_state])])
-                if new_state <= 0 or new_state >= available_capacity:
-                    # import (-) or excess (+)
-                    load_forecast.at[index, "grid"] = delta
-                else:
-                    # battery usage
-                    load_forecast.at[index, "grid"] = 0
-            load_forecast.at[index, "battery"] = battery
-
-        for index, _ in future.iterrows():
-            period = (
-                load_forecast.iloc[index]["period_start"].to_pydatetime().astimezone()
-            )
-            if period.time() == self._eco_start_time:
-                self._add_metadata(load_forecast, period)
+                battery_values[start] = battery
+                start += 1
+
+            if start < end:
+                battery_path, grid = simulation.run(
+                    battery, delta[start:end], peak[start:end], min_soc
+                )
+                battery_values[start:end] = battery_path
+                grid_values[start:end] = grid
+                battery = battery_path[-1]
+
+        self._add_results(index, battery_values, grid_values)
+
+        for eco_start in eco_starts:
+            period = self._period_start(minute[eco_start])
+            self._add_metadata(index, period)
+
+        self._model.update(
+            minute,
+            {
+                "pv_estimate": inputs.pv_estimate,
+                "load": inputs.load,
+                "battery": battery_values,
+                "grid": grid_values,
+            },
+            now,
+        )
+        self._index = index
+        self._inputs = inputs
+        self._ensemble = self._project_ensemble(
+            inputs, first, eco_starts, soc, hold_soc
+        )
+        # the model's own schedule updates are part of this refresh
+        self._last_refresh = (inputs_version, self._schedule.version(), soc, first)
+        self._ready = True
+
+    def snapshot(self) -> dict[str, np.ndarray]:
+        """Model values for the snapshot"""
+        return self._model.snapshot(datetime.now().astimezone())
+
+    def restore(self, arrays: dict[str, np.ndarray]) -> None:
+        """Restore model values from a snapshot and rebuild the window index"""
+        minute = arrays["minute"]
+        if len(minute) == 0 or minute[-1] <= ModelStore.epoch_minute(
+            datetime.now().astimezone()
+        ):
+            _LOGGER.debug("Battery model snapshot has expired, ignoring")
+            return
+
+        self._model.restore(arrays)
+
+        pv_estimate = arrays["pv_estimate"].astype(float)
+        load = arrays["load"].astype(float)
+        index = self._build_index(minute, pv_estimate, load, pv_estimate - load)
+        self._add_results(
+            index, arrays["battery"].astype(float), arrays["grid"].astype(float)
+        )
 
-        self._model = self._update_model_forecasts(load_forecast, now)
+        self._index = index
         self._ready = True
 
+    def _prepare_inputs(
+        self, forecast: pd.DataFrame, load: pd.DataFrame, version: tuple | None
+    ) -> ModelInputs:
+        """Merge load/forecast and derive the per period arrays"""
+        load_forecast = self._merge_dataframes(load, forecast)
+        load_forecast = load_forecast.sort_values(by="period_start")
+
+        period_start = load_forecast["period_start"].to_numpy(dtype="datetime64[ns]")
+        minute = period_start.astype("int64") // (60 * 10**9)
+        pv_estimate = load_forecast["pv_estimate"].to_numpy(dtype=float)
+        percentiles = {
+            column: load_forecast.get(column, load_forecast["pv_estimate"])
+            for column in ("pv_estimate10", "pv_estimate90")
+        }
+        load = load_forecast["load"].to_numpy(dtype=float)
+        delta = load_forecast["delta"].to_numpy(dtype=float)
+        seconds = self._peak_utils.local_seconds(minute * 60)
+
+        return ModelInputs(
+            version=version,
+            minute=minute,
+            pv_estimate=pv_estimate,
+            pv_estimate10=percentiles["pv_estimate10"].to_numpy(dtype=float),
+            pv_estimate90=percentiles["pv_estimate90"].to_numpy(dtype=float),
+            load=load,
+            index=self._build_index(minute, pv_estimate, load, delta),
+            seconds=seconds,
+            peak=self._peak_utils.in_peak_seconds(seconds),
+            delta=np.nan_to_num(delta),
+        )
+
+    def _build_index(
+        self,
+        minute: np.ndarray,
+        pv_estimate: np.ndarray,
+        load: np.ndarray,
+        delta: np.ndarray,
+    ) -> WindowIndex:
+        """Build window sums for the merged load/forecast"""
+        index = WindowIndex(minute)
+
+        index.add_sum("pv_estimate", pv_estimate)
+        index.add_sum("load", load)
+        index.add_sum("delta", delta)
+        index.add_events("dawn", (delta > 0) & (load > 0))
+
+        return index
+
+    def _add_results(
+        self, index: WindowIndex, battery_values: np.ndarray, grid_values: np.ndarray
+    ) -> None:
+        """Add window sums for the simulated battery/grid"""
+        index.add_sum("import", np.where(grid_values < 0, grid_values, 0))
+        index.add_sum("export", np.where(grid_values > 0, grid_values, 0))
+        index.add_events("empty", battery_values == 0)
+
     def _charge_totals(
         self,
-        model: pd.DataFrame,
+        index: WindowIndex,
         period: datetime,
         battery: float,
         boost: float = 0,
     ):
         """Return charge totals for dawn/day"""
         # calculate start/end of the next peak period
-        eco_start = period.replace(
-            hour=self._eco_start_time.hour,
-            minute=self._eco_start_time.minute,
-            second=0,
-            microsecond=0,
-        )
-        eco_end_time = self._peak_utils.next_eco_end(eco_start)
-        next_eco_start = eco_start + timedelta(days=1)
-        # grab all peak values
-        peak = model[
-            (model["period_start"] > eco_end_time)
-            & (model["period_start"] < next_eco_start)
-        ]
-
-        # sum forecast and house load
-        forecast_sum = peak.pv_estimate.sum()
-        load_sum = peak.load.sum()
-        dawn_load = self._dawn_load(model, eco_end_time)
-        dawn_charge = self._dawn_charge_needs(dawn_load)
-        day_charge = self._day_charge_needs(forecast_sum, load_sum)
-        max_charge = self._battery_utils.ceiling_charge_total(
-            max([dawn_charge, day_charge])
-        )
-        min_soc = (
-            max_charge
-            if boost == 0
-            else self._battery_utils.ceiling_charge_total(
-                max([battery, max_charge]) + boost
-            )
+        eco_start = self._eco_start(period)
+        needs = self._charge_needs(
+            index,
+            eco_start,
+            battery,
+            boost,
+            self._dawn_buffer,
+            self._day_buffer,
+            self._min_soc,
         )
-        total = self._battery_utils.ceiling_charge_total(max([0, min_soc - battery]))
+        total = float(needs["total"])
+        min_soc = float(needs["min_soc"])
         # store in dataframe for retrieval later
         self._schedule.upsert(
             eco_start,
@@ -177,10 +281,10 @@ class BatteryModel:
                 "eco_start": eco_start,
                 "eco_end": self._peak_utils.next_eco_end(eco_start),
                 "battery": battery,
-                "load": load_sum,
-                "forecast": forecast_sum,
-                "dawn": dawn_charge,
-                "day": day_charge,
+                "load": needs["load"],
+                "forecast": needs["forecast"],
+                "dawn": float(needs["dawn"]),
+                "day": float(needs["day"]),
                 "total": total,
                 "min_soc": min_soc,
             },
@@ -188,38 +292,363 @@ class BatteryModel:
 
         return total, min_soc
 
-    def _add_metadata(self, model: pd.DataFrame, period: datetime):
+    def _charge_needs(
+        self,
+        index: WindowIndex,
+        eco_start: datetime,
+        battery: np.ndarray | float,
+        boost: np.ndarray | float,
+        dawn_buffer: np.ndarray | float,
+        day_buffer: np.ndarray | float,
+        min_soc: np.ndarray | float,
+    ) -> dict:
+        """Charge needs at an eco start, for one or an array of scenarios"""
+        eco_end_time = self._peak_utils.next_eco_end(eco_start)
+        next_eco_start = eco_start + timedelta(days=1)
+
+        # sum forecast and house load across the peak period
+        forecast_sum = index.total("pv_estimate", eco_end_time, next_eco_start)
+        load_sum = index.total("load", eco_end_time, next_eco_start)
+        dawn_load = self._dawn_load(index, eco_end_time)
+
+        return self._charge_targets(
+            load_sum,
+            forecast_sum,
+            dawn_load,
+            battery,
+            boost,
+            dawn_buffer,
+            day_buffer,
+            min_soc,
+        )
+
+    def _charge_targets(
+        self,
+        load_sum: float,
+        forecast_sum: np.ndarray | float,
+        dawn_load: np.ndarray | float,
+        battery: np.ndarray | float,
+        boost: np.ndarray | float,
+        dawn_buffer: np.ndarray | float,
+        day_buffer: np.ndarray | float,
+        min_soc: np.ndarray | float,
+    ) -> dict:
+        """Charge needed to cover dawn/day load, for one or an array of scenarios"""
+        dawn_charge = np.round(np.maximum(0, dawn_load + dawn_buffer), 2)
+        day_charge = np.round(np.maximum(0, (load_sum + day_buffer) - forecast_sum), 2)
+
+        ceiling = self._battery_utils.ceiling_charge_total
+        max_charge = ceiling(np.maximum(dawn_charge, day_charge), min_soc)
+        boosted = ceiling(np.maximum(battery, max_charge) + boost, min_soc)
+        target = np.where(np.equal(boost, 0), max_charge, boosted)
+        total = ceiling(np.maximum(0, target - battery), min_soc)
+
+        return {
+            "load": load_sum,
+            "forecast": forecast_sum,
+            "dawn": dawn_charge,
+            "day": day_charge,
+            "total": total,
+            "min_soc": target,
+        }
+
+    def _add_metadata(self, index: WindowIndex, period: datetime):
         """Added metadata - i.e. grid import/export"""
         # calculate start/end of the next peak period
-        eco_start = period.replace(
-            hour=self._eco_start_time.hour,
-            minute=self._eco_start_time.minute,
-            second=0,
-            microsecond=0,
-        )
+        eco_start = self._eco_start(period)
         eco_end_time = self._peak_utils.next_eco_end(eco_start)
         next_eco_start = eco_start + timedelta(days=1)
-        # grab all peak values
-        peak = model[
-            (model["period_start"] > eco_end_time)
-            & (model["period_start"] < next_eco_start)
-        ]
 
-        # metadata - import/export
-        grid_import = abs(peak[(peak["grid"] < 0)].grid.sum())
-        grid_export = peak[(peak["grid"] > 0)].grid.sum()
+        # metadata - import/export across the peak period
+        grid_import = abs(index.total("import", eco_end_time, next_eco_start))
+        grid_export = index.total("export", eco_end_time, next_eco_start)
 
         self._schedule.upsert(
             eco_start,
             {"import": grid_import, "export": grid_export},
         )
 
+    def simulate(self, scenarios: list[dict]) -> list[dict]:
+        """Project charge, grid usage and depletion for candidate settings
+
+        All scenarios are simulated together from the cached inputs, without
+        updating the schedule.
+        """
+        inputs = self._inputs
+        if inputs is None:
+            raise NoDataError("Battery model has not been calculated")
+
+        now = datetime.now().astimezone()
+        minute = inputs.minute
+        index = inputs.index
+        first = int(np.searchsorted(minute, ModelStore.epoch_minute(now), "right"))
+        if first == len(minute):
+            _LOGGER.debug("Forecast has run out, nothing to simulate")
+            return [
+                {
+                    **scenario,
+                    "charge_total": 0,
+                    "import": 0,
+                    "export": 0,
+                    "depleted": None,
+                }
+                for scenario in scenarios
+            ]
+
+        eco_starts = first + np.flatnonzero(
+            inputs.seconds[first:] == self._peak_utils.eco_start_seconds()
+        )
+        if len(eco_starts) > 0:
+            next_eco_start = self._eco_start(self._period_start(minute[eco_starts[0]]))
+        else:
+            next_eco_start = self._peak_utils.next_eco_start()
+
+        # unspecified settings default to the current configuration/schedule
+        boost_status = self._get_boost(next_eco_start, "boost_status")
+        full_status = self._get_boost(next_eco_start, "full_status") > 0
+        boost = np.array(
+            [
+                max(
+                    scenario.get("boost", boost_status),
+                    self._capacity if scenario.get("full", full_status) else 0,
+                )
+                for scenario in scenarios
+            ],
+            dtype=float,
+        )
+        min_soc = np.array(
+            [
+                scenario["min_soc"] / 100 if "min_soc" in scenario else self._min_soc
+                for scenario in scenarios
+            ]
+        )
+        dawn_buffer = np.array(
+            [scenario.get("dawn_buffer", self._dawn_buffer) for scenario in scenarios]
+        )
+        day_buffer = np.array(
+            [scenario.get("day_buffer", self._day_buffer) for scenario in scenarios]
+        )
+
+        battery = self._battery_capacity() - (min_soc * self._capacity)
+        initial_battery = battery
+
+        hold_soc = np.full(len(scenarios), np.nan)
+        last_schedule = self._schedule.get(self._peak_utils.last_eco_start(now))
+        if last_schedule is not None:
+            # held above the configured min SoC, shift to each scenario's
+            shift = (self._min_soc - min_soc) * self._capacity
+            hold_soc = last_schedule["min_soc"] + shift
+        elif self._peak_utils.in_peak(now.time()):
+            hold_soc = self._charge_needs(
+                index,
+                self._eco_start(now),
+                battery,
+                0,
+                dawn_buffer,
+                day_buffer,
+                min_soc,
+            )["min_soc"]
+
+        battery_values = np.full((len(minute), len(scenarios)), np.nan)
+        grid_values = np.full((len(minute), len(scenarios)), np.nan)
+        charge_total = np.zeros(len(scenarios))
+        simulation = BatchSimulation(self._capacity - (min_soc * self._capacity))
+        boundaries = np.unique(np.concatenate(([first], eco_starts, [len(minute)])))
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            if start in eco_starts:
+                eco_start = self._eco_start(self._period_start(minute[start]))
+                additional = (
+                    boost
+                    if eco_start == next_eco_start
+                    else self._get_total_additional_charge(eco_start)
+                )
+                needs = self._charge_needs(
+                    index,
+                    eco_start,
+                    battery,
+                    additional,
+                    dawn_buffer,
+                    day_buffer,
+                    min_soc,
+                )
+                if eco_start == next_eco_start:
+                    charge_total = needs["total"]
+                battery = battery + needs["total"]
+                hold_soc = np.broadcast_to(needs["min_soc"], battery.shape)
+                battery_values[start] = battery
+                start += 1
+
+            if start < end:
+                battery_path, grid = simulation.run(
+                    battery, inputs.delta[start:end], inputs.peak[start:end], hold_soc
+                )
+                battery_values[start:end] = battery_path
+                grid_values[start:end] = grid
+                battery = battery_path[-1]
+
+        # import/export across the peak period following the next eco start
+        peak_period = index.span(
+            self._peak_utils.next_eco_end(next_eco_start),
+            next_eco_start + timedelta(days=1),
+        )
+        grid = grid_values[peak_period]
+        grid_import = np.abs(np.where(grid < 0, grid, 0).sum(axis=0))
+        grid_export = np.where(grid > 0, grid, 0).sum(axis=0)
+
+        empty = battery_values[first:] == 0
+        depleted = first + np.argmax(empty, axis=0)
+
+        results = []
+        for i, scenario in enumerate(scenarios):
+            if initial_battery[i] <= 0:
+                depleted_time = None
+            elif empty[:, i].any():
+                depleted_time = index.period_start(depleted[i]).isoformat()
+            else:
+                depleted_time = index.last_period().isoformat()
+
+            results.append(
+                {
+                    **scenario,
+                    "charge_total": round(float(charge_total[i]), 2),
+                    "import": round(float(grid_import[i]), 2),
+                    "export": round(float(grid_export[i]), 2),
+                    "depleted": depleted_time,
+                }
+            )
+
+        return results
+
+    def _project_ensemble(
+        self,
+        inputs: ModelInputs,
+        first: int,
+        eco_starts: np.ndarray,
+        battery: float,
+        hold_soc: float | None,
+    ) -> dict | None:
+        """Grid import and charge needed at the next eco start across PV scenarios
+
+        Scenarios are evenly spaced quantiles interpolated between the P10, P50
+        and P90 estimates, quantiles in the tails take the P10/P90 estimate.
+        """
+        if len(eco_starts) == 0:
+            return None
+
+        minute = inputs.minute
+        index = inputs.index
+        eco_position = int(eco_starts[0])
+        period = self._period_start(minute[eco_position])
+        eco_start = self._eco_start(period)
+        eco_end_time = self._peak_utils.next_eco_end(eco_start)
+        next_eco_start = eco_start + timedelta(days=1)
+
+        # model dates are UTC calendar days
+        day_start = datetime.combine(eco_end_time.date(), time(), tzinfo=timezone.utc)
+        dawn_day = index.span(day_start, day_start + timedelta(days=1), True)
+        noon = eco_end_time.replace(hour=12, minute=0, second=0, microsecond=0)
+        noon = index.span(noon, noon, True).start
+        peak_period = index.span(eco_end_time, next_eco_start)
+
+        base = min(first, dawn_day.start)
+        stop = min(
+            max(dawn_day.stop, peak_period.stop, noon, eco_position), len(minute)
+        )
+        window = slice(base, stop)
+
+        quantile = (np.arange(_ENSEMBLE_SIZE) + 0.5) / _ENSEMBLE_SIZE
+        lower = np.clip((0.5 - quantile) / 0.4, 0, 1)
+        upper = np.clip((quantile - 0.5) / 0.4, 0, 1)
+        pv_estimate = inputs.pv_estimate[window, None]
+        pv = (
+            pv_estimate
+            + (inputs.pv_estimate10[window, None] - pv_estimate) * lower
+            + (inputs.pv_estimate90[window, None] - pv_estimate) * upper
+        )
+        load = inputs.load[window, None]
+        delta = pv - load
+
+        # simulate each scenario up to the next eco start
+        available_capacity = self._capacity - (self._min_soc * self._capacity)
+        simulation = BatchSimulation(np.full(_ENSEMBLE_SIZE, available_capacity))
+        battery = np.full(_ENSEMBLE_SIZE, battery)
+        grid_import = np.zeros(_ENSEMBLE_SIZE)
+        if eco_position > first:
+            battery_path, grid = simulation.run(
+                battery,
+                np.nan_to_num(delta[first - base : eco_position - base]),
+                inputs.peak[first:eco_position],
+                np.full(_ENSEMBLE_SIZE, np.nan if hold_soc is None else hold_soc),
+            )
+            battery = battery_path[-1]
+            grid_import = -np.nansum(np.minimum(grid, 0), axis=0)
+
+        # dawn is the first period solar covers the load, midday if it never does
+        day = slice(dawn_day.start - base, dawn_day.stop - base)
+        dawn = (delta[day] > 0) & (load[day] > 0)
+        dawn_position = np.where(
+            dawn.any(axis=0), dawn_day.start + np.argmax(dawn, axis=0), noon
+        )
+        dawn_position = np.maximum(dawn_position, peak_period.start)
+        cumulative = np.vstack(
+            (np.zeros(_ENSEMBLE_SIZE), np.cumsum(np.nan_to_num(delta), axis=0))
+        )
+        scenarios = np.arange(_ENSEMBLE_SIZE)
+        dawn_load = np.round(
+            np.abs(
+                cumulative[dawn_position - base, scenarios]
+                - cumulative[peak_period.start - base]
+            ),
+            2,
+        )
+
+        peak = slice(peak_period.start - base, peak_period.stop - base)
+        needs = self._charge_targets(
+            index.total("load", eco_end_time, next_eco_start),
+            pv[peak].sum(axis=0),
+            dawn_load,
+            battery,
+            self._get_total_additional_charge(period),
+            self._dawn_buffer,
+            self._day_buffer,
+            self._min_soc,
+        )
+
+        # charge which covers the needs of the chosen share of scenarios
+        position = int(np.ceil(self._charge_confidence * _ENSEMBLE_SIZE)) - 1
+        charge_total = np.sort(needs["total"])[max(position, 0)]
+
+        return {
+            "eco_start": eco_start,
+            "import_probability": float(np.mean(grid_import >= _IMPORT_THRESHOLD)),
+            "import": float(grid_import.mean()),
+            "charge_total": float(charge_total),
+        }
+
+    def import_probability(self) -> float:
+        """Probability of grid import before the next eco start"""
+        return self._ensemble_value("import_probability")
+
+    def expected_import(self) -> float:
+        """Mean grid import across scenarios before the next eco start"""
+        return self._ensemble_value("import")
+
+    def confident_charge_total(self) -> float:
+        """Charge needed at the next eco start at the chosen confidence"""
+        return self._ensemble_value("charge_total")
+
+    def _ensemble_value(self, name: str) -> float:
+        """Ensemble result"""
+        if self._ensemble is None:
+            raise NoDataError("No ensemble projection available")
+        return self._ensemble[name]
+
     def next_dawn_time(self) -> datetime:
         """Calculate dawn time"""
         now = datetime.now().astimezone()
 
-        dawn_today = self._dawn_time(self._model, now)
-        dawn_tomorrow = self._dawn_time(self._model, now + timedelta(days=1))
+        dawn_today = self._dawn_time(self._index, now)
+        dawn_tomorrow = self._dawn_time(self._index, now + timedelta(days=1))
 
         if now > dawn_today:
             return dawn_tomorrow
@@ -229,7 +658,7 @@ class BatteryModel:
     def todays_dawn_time(self) -> datetime:
         """Calculate dawn time"""
         now = datetime.now().astimezone()
-        return self._dawn_time(self._model, now)
+        return self._dawn_time(self._index, now)
 
     def battery_depleted_time(self) -> datetime:
         """Time battery capacity is 0"""
@@ -238,51 +667,43 @@ class BatteryModel:
             # battery is already empty, prevent constant time updates and set sensor to unknown
             return None
 
-        battery_depleted = self._model[
-            (self._model["battery"] == 0)
-            & (self._model["period_start"] > datetime.now().astimezone())
-        ]
+        battery_depleted = self._index.first("empty", datetime.now().astimezone())
 
-        if len(battery_depleted) == 0:
+        if battery_depleted is None:
             # battery runs past our model, return the last result
-            return self._model.iloc[-1].period_start
+            return self._index.last_period()
 
-        return battery_depleted.iloc[0].period_start
+        return battery_depleted
 
     def peak_grid_import(self) -> float:
         """Grid usage required to next eco start"""
         now = datetime.now().astimezone()
         eco_start = self._peak_utils.next_eco_start()
 
-        grid_use = self._model[
-            (self._model["grid"] < 0)
-            & (self._model["period_start"] > now)
-            & (self._model["period_start"] < eco_start)
-        ]
-
-        if len(grid_use) == 0:
-            return 0
+        grid_use = self._index.total("import", now, eco_start)
 
-        return round(abs(grid_use.grid.sum()), 2)
+        return round(abs(grid_use), 2)
 
     def peak_grid_export(self) -> float:
         """Grid usage required to next eco start"""
         now = datetime.now().astimezone()
         eco_start = self._peak_utils.next_eco_start()
 
-        grid_export = self._model[
-            (self._model["grid"] > 0)
-            & (self._model["period_start"] > now)
-            & (self._model["period_start"] < eco_start)
-        ]
+        grid_export = self._index.total("export", now, eco_start)
 
-        if len(grid_export) == 0:
-            return 0
-
-        return round(grid_export.grid.sum(), 2)
+        return round(grid_export, 2)
 
     def _battery_capacity_remaining(self) -> float:
         """Usable capacity remaining"""
+        return self._battery_capacity() - (self._min_soc * self._capacity)
+
+    def _battery_capacity(self) -> float:
+        """Capacity remaining, including the minimum SoC"""
+        if self._soc_source is not None:
+            soc = self._soc_source()
+            if soc is not None:
+                return (soc / 100) * self._capacity
+
         battery_state = self._hass.states.get(self._battery_soc)
         if battery_state is None:
             raise NoDataError("Battery state is invalid")
@@ -290,18 +711,8 @@ class BatteryModel:
             raise NoDataError("Battery state is unknown")
 
         battery_soc = int(battery_state.state)
-        battery_capacity = (battery_soc / 100) * self._capacity
-
-        return battery_capacity - (self._min_soc * self._capacity)
 
-    def _update_model_forecasts(self, future: pd.DataFrame, now: datetime):
-        # keep original values including load, pv, grid etc
-        hist = self._model[
-            (self._model["period_start"] <= now)
-            & (self._model["period_start"] > (now - timedelta(days=3)))
-        ]
-        # set global model
-        return pd.concat([hist, future])
+        return (battery_soc / 100) * self._capacity
 
     def _get_total_additional_charge(self, period: datetime):
         """Get all additional charge"""
@@ -320,48 +731,57 @@ class BatteryModel:
 
     def _merge_dataframes(self, load: pd.DataFrame, forecast: pd.DataFrame):
         """Merge load and forecast dataframes"""
-        load = load.groupby(load["time"]).mean()
-        load["time"] = load.index.values
+        # reset indexes, without modifying the shared forecast
+        forecast = forecast.reset_index(drop=True)
+
+        on = ["time"]
+        if "weekend" in load.columns and load["weekend"].nunique() == 2:
+            # separate weekday/weekend load profiles, once both are in the history
+            period_start = forecast["period_start"].to_numpy(dtype="datetime64[ns]")
+            forecast["weekend"] = self._peak_utils.local_weekend(
+                period_start.astype("int64") // 10**9
+            )
+            on = ["weekend", "time"]
 
-        # reset indexes
-        load.reset_index(drop=True, inplace=True)
-        forecast.reset_index(drop=True, inplace=True)
+        load = load.groupby(on, as_index=False)["load"].mean()
 
         # merge load and forecast to produce a delta
-        load_forecast = pd.merge(load, forecast, how="right", on=["time"])
+        load_forecast = pd.merge(load, forecast, how="right", on=on)
         load_forecast["delta"] = load_forecast["pv_estimate"] - load_forecast["load"]
 
         load_forecast.reset_index(drop=True, inplace=True)
 
         return load_forecast
 
-    def _dawn_load(self, model: pd.DataFrame, eco_end_time: datetime) -> float:
+    def _dawn_load(self, index: WindowIndex, eco_end_time: datetime) -> float:
         """Dawn load"""
-        dawn_time = self._dawn_time(model, eco_end_time)
-
-        dawn_load = model[
-            (model["period_start"] > eco_end_time) & (model["period_start"] < dawn_time)
-        ]
+        dawn_time = self._dawn_time(index, eco_end_time)
 
-        load_sum = abs(dawn_load.delta.sum())
+        load_sum = abs(index.total("delta", eco_end_time, dawn_time))
 
         return round(load_sum, 2)
 
-    def _dawn_time(self, model: pd.DataFrame, date: datetime) -> datetime:
+    def _eco_start(self, period: datetime) -> datetime:
+        """Eco start on the day of a period"""
+        return period.replace(
+            hour=self._eco_start_time.hour,
+            minute=self._eco_start_time.minute,
+            second=0,
+            microsecond=0,
+        )
+
+    def _period_start(self, minute: int) -> datetime:
+        """Local period start of an epoch minute"""
+        return datetime.fromtimestamp(int(minute) * 60, timezone.utc).astimezone()
+
+    def _dawn_time(self, index: WindowIndex, date: datetime) -> datetime:
         """Calculate dawn time"""
-        filtered = model[model["date"] == date.date()]
-        dawn = filtered[(filtered["delta"] > 0) & (filtered["load"] > 0)]
+        # model dates are UTC calendar days
+        day_start = datetime.combine(date.date(), time(), tzinfo=timezone.utc)
+        dawn = index.first("dawn", day_start, day_start + timedelta(days=1), True)
 
-        if len(dawn) == 0:
+        if dawn is None:
             # Solar never reaches house load... return mid-day
             return date.replace(hour=12, minute=0, second=0, microsecond=0)
         else:
-            return dawn.iloc[0].period_start.to_pydatetime()
-
-    def _dawn_charge_needs(self, dawn_load: float) -> float:
-        """Dawn charge needs"""
-        return round(max([0, dawn_load + self._dawn_buffer]), 2)
-
-    def _day_charge_needs(self, forecast: float, house_load: float) -> float:
-        """Day charge needs"""
-        return round(max([0, (house_load + self._day_buffer) - forecast]), 2)
+            return dawn
@@ -3,7 +3,7 @@
 import logging
 
 from homeassistant.components.sensor import SensorDeviceClass
-from homeassistant.const import UnitOfEnergy
+from homeassistant.const import PERCENTAGE, UnitOfEnergy
 
 from ..common.sensor import Sensor
 from ..common.sensor_desc import SensorDescription
@@ -52,6 +52,9 @@ SENSORS: dict[str, SensorDescription] = {
             "Battery:": "battery_last_update_str",
             "Forecast:": "forecast_last_update_str",
             "Average:": "average_last_update_str",
+            "Refreshes:": "refresh_count",
+            "Coalesced Triggers:": "coalesced_count",
+            "Max Loop Block (ms):": "max_loop_block",
         },
     ),
     "peak_grid_import": SensorDescription(
@@ -72,6 +75,24 @@ SENSORS: dict[str, SensorDescription] = {
         should_poll=False,
         state_attributes={},
     ),
+    "import_probability": SensorDescription(
+        key="import_probability",
+        device_class=None,
+        native_unit_of_measurement=PERCENTAGE,
+        name="Capacity: Grid Import Risk",
+        icon="mdi:transmission-tower-import",
+        should_poll=False,
+        state_attributes={"Expected Import (kWh):": "expected_import"},
+    ),
+    "confident_charge_total": SensorDescription(
+        key="confident_charge_total",
+        device_class=SensorDeviceClass.ENERGY,
+        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        name="Capacity: Charge Needed (Confidence)",
+        icon="mdi:flash-alert",
+        should_poll=False,
+        state_attributes={"Confidence %:": "charge_confidence"},
+    ),
     "battery_depleted": SensorDescription(
         key="battery_depleted",
         device_class=SensorDeviceClass.TIMESTAMP,
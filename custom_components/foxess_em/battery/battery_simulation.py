@@ -0,0 +1,144 @@
+"""Battery simulation"""
+
+import logging
+
+import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class BatterySimulation:
+    """Vectorised battery state of charge simulation"""
+
+    def __init__(self, capacity: float) -> None:
+        """Init"""
+        self._capacity = capacity
+
+    def run(
+        self,
+        battery: float,
+        delta: np.ndarray,
+        hold: np.ndarray,
+        min_soc: float | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Simulate battery and grid values for the periods between eco starts
+
+        Grid values are NaN where the battery is held at the minimum SoC, which
+        mirrors the original per-period model.
+        """
+        size = len(delta)
+        battery_path = np.empty(size)
+        grid = np.full(size, np.nan)
+
+        if min_soc is None:
+            hold = np.zeros(size, dtype=bool)
+
+        index = 0
+        while index < size:
+            if hold[index] and battery < min_soc:
+                index = self._hold(battery_path, grid, delta, hold, min_soc, index)
+            else:
+                index = self._discharge(
+                    battery_path, grid, battery, delta, hold, min_soc, index
+                )
+            battery = battery_path[index - 1]
+
+        return battery_path, grid
+
+    def _hold(
+        self,
+        battery_path: np.ndarray,
+        grid: np.ndarray,
+        delta: np.ndarray,
+        hold: np.ndarray,
+        min_soc: float,
+        index: int,
+    ) -> int:
+        """Hold SoC at the minimum, returns the next index to simulate"""
+        battery_path[index] = min_soc
+
+        # whilst discharging in the off-peak period the battery alternates between
+        # dipping below the minimum SoC and being held, skip over those pairs
+        dips = np.arange(index + 1, len(delta) - 1, 2)
+        new_state = min_soc + delta[dips]
+        dip_state = np.clip(new_state, 0, self._capacity)
+        held = hold[dips + 1] & (dip_state < min_soc)
+        pairs = len(dips) if held.all() else int(np.argmin(held))
+
+        dips = dips[:pairs]
+        battery_path[dips] = dip_state[:pairs]
+        battery_path[dips + 1] = min_soc
+        grid[dips] = self._grid(new_state[:pairs], delta[dips])
+
+        return index + 1 + (2 * pairs)
+
+    def _discharge(
+        self,
+        battery_path: np.ndarray,
+        grid: np.ndarray,
+        battery: float,
+        delta: np.ndarray,
+        hold: np.ndarray,
+        min_soc: float | None,
+        index: int,
+    ) -> int:
+        """Charge/discharge freely until the SoC needs holding"""
+        path = self._clamped_path(battery, delta[index:])
+
+        stop = len(path)
+        if min_soc is not None:
+            held = np.flatnonzero(hold[index + 1 :] & (path[:-1] < min_soc))
+            if len(held) > 0:
+                stop = held[0] + 1
+
+        path = path[:stop]
+        previous = np.concatenate(([battery], path[:-1]))
+        battery_path[index : index + stop] = path
+        grid[index : index + stop] = self._grid(
+            previous + delta[index : index + stop], delta[index : index + stop]
+        )
+
+        return index + stop
+
+    def _clamped_path(self, battery: float, delta: np.ndarray) -> np.ndarray:
+        """Battery path bounded by empty and full capacity
+
+        Reflects the cumulative delta against one bound at a time, switching bound
+        each time the other one is breached.
+        """
+        size = len(delta)
+        path = np.empty(size)
+        floor = True
+        index = 0
+
+        while index < size:
+            level = battery + np.cumsum(delta[index:])
+            if floor:
+                offset = np.minimum(np.minimum.accumulate(level), 0)
+                reflected = level - offset
+                breach = np.flatnonzero(reflected > self._capacity)
+            else:
+                running_max = np.maximum.accumulate(level)
+                offset = np.maximum(running_max - self._capacity, 0)
+                reflected = level - offset
+                reflected[(offset > 0) & (level == running_max)] = self._capacity
+                breach = np.flatnonzero(reflected < 0)
+
+            if len(breach) == 0:
+                path[index:] = reflected
+                break
+
+            stop = breach[0]
+            path[index : index + stop] = reflected[:stop]
+            battery = self._capacity if floor else 0
+            path[index + stop] = battery
+            index += stop + 1
+            floor = not floor
+
+        return path
+
+    def _grid(self, new_state: np.ndarray, delta: np.ndarray) -> np.ndarray:
+        """Import (-) or excess (+) when the battery cannot absorb the delta"""
+        return np.where(
+            (new_state <= 0) | (new_state >= self._capacity), delta, 0
+        ).astype(float)
@@ -2,6 +2,8 @@
 
 import logging
 
+import numpy as np
+
 _LOGGER = logging.getLogger(__name__)
 _MAX_PERC = 100
 
@@ -20,11 +22,13 @@ class BatteryUtils:
 
         return min(_MAX_PERC, round(perc, 0))
 
-    def ceiling_charge_total(self, charge_total: float) -> float:
-        """Ceiling total charge"""
-        available_capacity = round(
-            self._capacity - (self._min_soc * self._capacity),
-            2,
-        )
+    def ceiling_charge_total(
+        self, charge_total: np.ndarray | float, min_soc: np.ndarray | float = None
+    ) -> np.ndarray | float:
+        """Ceiling total charge, optionally for other minimum SoCs"""
+        if min_soc is None:
+            min_soc = self._min_soc
+
+        available_capacity = np.round(self._capacity - (min_soc * self._capacity), 2)
 
-        return round(min(available_capacity, charge_total), 2)
+        return np.round(np.minimum(available_capacity, charge_total), 2)
@@ -0,0 +1,23 @@
+"""Battery model inputs"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .window_index import WindowIndex
+
+
+@dataclass
+class ModelInputs:
+    """Merged load/forecast inputs, reused until the forecast or load changes"""
+
+    version: tuple
+    minute: np.ndarray
+    pv_estimate: np.ndarray
+    pv_estimate10: np.ndarray
+    pv_estimate90: np.ndarray
+    load: np.ndarray
+    index: WindowIndex
+    seconds: np.ndarray
+    peak: np.ndarray
+    delta: np.ndarray
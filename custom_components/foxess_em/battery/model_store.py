@@ -0,0 +1,183 @@
+"""Battery model store"""
+
+from datetime import datetime
+import logging
+from threading import RLock
+
+import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+_COLUMNS = ("pv_estimate", "load", "battery", "grid")
+_RAW_MINUTES = 5
+
+
+class ModelStore:
+    """Columnar store of model values, keyed by epoch minute
+
+    The latest model is held as-is, periods which pass into history are moved
+    to a fixed-capacity ring buffer so history never grows between refreshes.
+    """
+
+    def __init__(self, history_minutes: int) -> None:
+        """Init"""
+        self._capacity = history_minutes
+        self._minute = np.empty(0, dtype=np.int64)
+        self._values = {column: np.empty(0, dtype=np.float32) for column in _COLUMNS}
+        self._history_minute = np.zeros(history_minutes, dtype=np.int64)
+        self._history = {
+            column: np.full(history_minutes, np.nan, dtype=np.float32)
+            for column in _COLUMNS
+        }
+        self._head = 0
+        self._size = 0
+        self._last_history = np.iinfo(np.int64).min
+        # updated from the refresh worker whilst read on the event loop
+        self._lock = RLock()
+
+    def update(
+        self, minute: np.ndarray, values: dict[str, np.ndarray], now: datetime
+    ) -> None:
+        """Replace the model, moving periods now in the past into history"""
+        now_minute = self.epoch_minute(now)
+        minute = minute.astype(np.int64)
+        values = {
+            column: np.asarray(values[column], dtype=np.float32) for column in _COLUMNS
+        }
+
+        with self._lock:
+            passed = (self._minute > self._last_history) & (self._minute <= now_minute)
+            if passed.any():
+                self._append_history(
+                    self._minute[passed],
+                    {column: self._values[column][passed] for column in _COLUMNS},
+                )
+
+            self._minute = minute
+            self._values = values
+
+    def history(self, now: datetime) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """History in time order, limited to the capacity of the buffer"""
+        with self._lock:
+            positions = (
+                self._head - self._size + np.arange(self._size)
+            ) % self._capacity
+            minute = self._history_minute[positions]
+            keep = minute > self.epoch_minute(now) - self._capacity
+
+            return minute[keep], {
+                column: self._history[column][positions][keep] for column in _COLUMNS
+            }
+
+    def combined(self, now: datetime) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """History and the latest model, preferring history where both exist"""
+        with self._lock:
+            hist_minute, hist_values = self.history(now)
+            model_minute, model_values = self._minute, self._values
+
+        latest = np.ones(len(model_minute), dtype=bool)
+        if len(hist_minute) > 0:
+            latest = (model_minute < hist_minute[0]) | (model_minute > hist_minute[-1])
+
+        minute = np.concatenate((hist_minute, model_minute[latest]))
+        order = np.argsort(minute, kind="stable")
+        values = {
+            column: np.concatenate((hist_values[column], model_values[column][latest]))[
+                order
+            ]
+            for column in _COLUMNS
+        }
+
+        return minute[order], values
+
+    def snapshot(self, now: datetime) -> dict[str, np.ndarray]:
+        """Latest model and history for the snapshot"""
+        with self._lock:
+            hist_minute, hist_values = self.history(now)
+            model_minute, model_values = self._minute, self._values
+
+        return {
+            "minute": model_minute,
+            **model_values,
+            "history_minute": hist_minute,
+            **{f"history_{column}": hist_values[column] for column in _COLUMNS},
+        }
+
+    def restore(self, arrays: dict[str, np.ndarray]) -> None:
+        """Restore the latest model and history from a snapshot"""
+        with self._lock:
+            self._minute = arrays["minute"].astype(np.int64)
+            self._values = {
+                column: arrays[column].astype(np.float32) for column in _COLUMNS
+            }
+
+            if len(arrays["history_minute"]) > 0:
+                self._append_history(
+                    arrays["history_minute"].astype(np.int64),
+                    {column: arrays[f"history_{column}"] for column in _COLUMNS},
+                )
+
+    def raw_data(self, now: datetime) -> dict[str, list]:
+        """Five minute averages split into history and forecast records"""
+        minute, values = self.combined(now)
+
+        raw_data = {"history": [], "forecast": []}
+        if len(minute) == 0:
+            return raw_data
+
+        buckets = minute // _RAW_MINUTES
+        positions = buckets - buckets[0]
+        size = positions[-1] + 1
+
+        means = {}
+        for column in _COLUMNS:
+            column_values = values[column].astype(float)
+            valid = ~np.isnan(column_values)
+            sums = np.bincount(
+                positions, weights=np.where(valid, column_values, 0), minlength=size
+            )
+            counts = np.bincount(positions, weights=valid, minlength=size)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means[column] = np.where(counts > 0, sums / counts, np.nan)
+
+        starts = (buckets[0] + np.arange(size)) * _RAW_MINUTES
+        split = int(np.searchsorted(starts * 60, now.timestamp(), side="right"))
+
+        records = [
+            {
+                **{
+                    column: (
+                        None
+                        if np.isnan(means[column][i])
+                        else round(float(means[column][i]), 10)
+                    )
+                    for column in _COLUMNS
+                },
+                "period_start": int(starts[i]) * 60000,
+            }
+            for i in range(size)
+        ]
+        raw_data["history"] = records[:split]
+        raw_data["forecast"] = records[split:]
+
+        return raw_data
+
+    @staticmethod
+    def epoch_minute(when: datetime) -> int:
+        """Epoch minute of a time"""
+        return int(when.timestamp() // 60)
+
+    def _append_history(self, minute: np.ndarray, values: dict[str, np.ndarray]):
+        """Write periods into the ring buffer, overwriting the oldest"""
+        if len(minute) > self._capacity:
+            minute = minute[-self._capacity :]
+            values = {column: values[column][-self._capacity :] for column in _COLUMNS}
+
+        positions = (self._head + np.arange(len(minute))) % self._capacity
+        self._history_minute[positions] = minute
+        for column in _COLUMNS:
+            self._history[column][positions] = values[column]
+
+        self._head = (self._head + len(minute)) % self._capacity
+        self._size = min(self._capacity, self._size + len(minute))
+        self._last_history = int(minute[-1])
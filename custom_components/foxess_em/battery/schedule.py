@@ -2,6 +2,7 @@
 
 from datetime import datetime, timedelta
 import logging
+from threading import Lock
 from typing import Any
 
 from homeassistant.core import HomeAssistant
@@ -21,6 +22,9 @@ class Schedule(HassLoadController, UnloadController):
         """Get persisted schedule from states"""
         self._hass = hass
         self._schedule = {}
+        self._version = 0
+        # the battery model updates the schedule from its refresh worker
+        self._lock = Lock()
 
         # Setup mixins
         UnloadController.__init__(self)
@@ -41,45 +45,67 @@ class Schedule(HassLoadController, UnloadController):
         """Load schedule from state"""
         schedule = self._hass.states.get(_SCHEDULE)
 
-        if schedule is not None and "schedule" in schedule.attributes:
-            self._schedule = schedule.attributes["schedule"]
-        else:
-            self._schedule = {}
+        with self._lock:
+            if schedule is not None and "schedule" in schedule.attributes:
+                self._schedule = schedule.attributes["schedule"]
+            else:
+                self._schedule = {}
+            self._version += 1
 
         self._housekeeping()
 
+    def restore(self, schedule: dict[str, dict[str, Any]]) -> None:
+        """Restore schedule items from a snapshot"""
+        with self._lock:
+            self._schedule = schedule
+            self._version += 1
+
     def upsert(self, index: datetime, params: dict) -> None:
         """Update or insert new item"""
         _LOGGER.debug(f"Updating schedule {index}: {params}")
 
         index = index.isoformat()
-        if index in self._schedule:
-            self._schedule[index].update(params)
-        else:
-            self._schedule[index] = params
+        with self._lock:
+            if index in self._schedule:
+                self._schedule[index].update(params)
+            else:
+                self._schedule[index] = params
+            self._version += 1
 
     def get_all(self) -> dict[str, dict[str, Any]] | None:
-        """Retrieve schedule item"""
-        return self._schedule
+        """Retrieve a copy of all schedule items"""
+        with self._lock:
+            return {k: dict(v) for k, v in self._schedule.items()}
 
     def get(self, index: datetime) -> dict[str, Any] | None:
-        """Retrieve schedule item"""
+        """Retrieve a copy of a schedule item"""
         index = index.isoformat()
 
-        if index in self._schedule:
-            return self._schedule[index]
-        else:
-            return None
+        with self._lock:
+            if index in self._schedule:
+                return dict(self._schedule[index])
+            else:
+                return None
+
+    def version(self) -> int:
+        """Incremented on every schedule change"""
+        return self._version
 
     def clear(self) -> None:
         """Reset all schedule items"""
-        self._schedule.clear()
+        with self._lock:
+            self._schedule.clear()
+            self._version += 1
 
     def _housekeeping(self, *args) -> None:
         """Clean up schedule"""
         two_weeks_ago = datetime.now().astimezone() - timedelta(days=14)
 
-        for schedule in list(self._schedule.keys()):
-            if datetime.fromisoformat(schedule) < two_weeks_ago:
-                _LOGGER.debug(f"Schedule housekeeping, removing data for {schedule}")
-                self._schedule.pop(schedule)
+        with self._lock:
+            for schedule in list(self._schedule.keys()):
+                if datetime.fromisoformat(schedule) < two_weeks_ago:
+                    _LOGGER.debug(
+                        f"Schedule housekeeping, removing data for {schedule}"
+                    )
+                    self._schedule.pop(schedule)
+                    self._version += 1
@@ -0,0 +1,85 @@
+"""Window index"""
+
+from copy import copy
+from datetime import datetime, timezone
+import logging
+
+import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class WindowIndex:
+    """Prefix sum index for totals over model time windows"""
+
+    def __init__(self, minute: np.ndarray) -> None:
+        """Init from sorted period starts in epoch minutes"""
+        self._epoch = minute * 60
+        self._sums = {}
+        self._events = {}
+
+    def copy(self) -> "WindowIndex":
+        """Copy sharing the existing sums, so new columns can be added"""
+        index = copy(self)
+        index._sums = dict(self._sums)
+        index._events = dict(self._events)
+
+        return index
+
+    def add_sum(self, name: str, values: np.ndarray) -> None:
+        """Add cumulative sums for a column, NaN values count as zero"""
+        self._sums[name] = np.concatenate(([0], np.cumsum(np.nan_to_num(values))))
+
+    def add_events(self, name: str, mask: np.ndarray) -> None:
+        """Add positions of periods matching a condition"""
+        self._events[name] = np.flatnonzero(mask)
+
+    def total(self, name: str, start: datetime, end: datetime) -> float:
+        """Total of a column for periods strictly between start and end"""
+        span = self.span(start, end)
+
+        if span.stop == span.start:
+            return 0
+
+        sums = self._sums[name]
+        return sums[span.stop] - sums[span.start]
+
+    def span(self, start: datetime, end: datetime, inclusive: bool = False) -> slice:
+        """Positions of periods between start (if inclusive) and end"""
+        first = self._position(start, inclusive)
+        last = self._position(end, inclusive=True)
+
+        return slice(first, max(first, last))
+
+    def first(
+        self,
+        name: str,
+        start: datetime,
+        end: datetime | None = None,
+        inclusive: bool = False,
+    ) -> datetime | None:
+        """First period start of an event after start (and before end)"""
+        events = self._events[name]
+        first = np.searchsorted(events, self._position(start, inclusive))
+
+        if first == len(events):
+            return None
+
+        position = events[first]
+        if end is not None and position >= self._position(end, inclusive=True):
+            return None
+
+        return self.period_start(position)
+
+    def last_period(self) -> datetime:
+        """Last period start in the index"""
+        return self.period_start(len(self._epoch) - 1)
+
+    def period_start(self, position: int) -> datetime:
+        """UTC period start at a position"""
+        return datetime.fromtimestamp(int(self._epoch[position]), timezone.utc)
+
+    def _position(self, when: datetime, inclusive: bool) -> int:
+        """Position of the first period after (or at, if inclusive) a time"""
+        side = "left" if inclusive else "right"
+        return int(np.searchsorted(self._epoch, when.timestamp(), side=side))
@@ -4,7 +4,7 @@ import asyncio
 from datetime import date, datetime, time, timedelta
 import logging
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.event import (
     async_track_state_change,
     async_track_utc_time_change,
@@ -16,6 +16,7 @@ from custom_components.foxess_em.util.peak_period_util import PeakPeriodUtils
 from ..battery.battery_controller import BatteryController
 from ..common.unload_controller import UnloadController
 from ..forecast.forecast_controller import ForecastController
+from ..telemetry.telemetry_controller import TelemetryController
 
 _LOGGER = logging.getLogger(__name__)
 _CHARGE_BUFFER = timedelta(minutes=30)
@@ -39,6 +40,7 @@ class ChargeService(UnloadController):
         original_soc: int,
         charge_amps: float,
         battery_volts: float,
+        telemetry: TelemetryController | None = None,
     ) -> None:
         """Init charge service"""
         UnloadController.__init__(self)
@@ -60,12 +62,18 @@ class ChargeService(UnloadController):
         self._charge_required = 0
         self._disable = False
         self._custom_charge_profile = False
+        self._telemetry = telemetry
+        self._telemetry_listening = False
+
+        if telemetry is not None:
+            telemetry.add_soc_listener(self._telemetry_soc_change)
 
     def _add_listeners(self) -> None:
         # Setup trigger to start just before eco period starts
         eco_start_setup_time = (
             datetime.combine(date.today(), self._eco_start_time) - timedelta(minutes=5)
         ).time()
+        self._forecast_controller.reserve_refresh(eco_start_setup_time)
         eco_start_setup = async_track_utc_time_change(
             self._hass,
             self._eco_start_setup,
@@ -103,13 +111,11 @@ class ChargeService(UnloadController):
 
         _LOGGER.debug("Calculating optimal battery SoC")
         await self._forecast_controller.async_refresh()
+        # the forecast refresh only queues a battery refresh, so wait for one
+        await self._battery_controller.async_refresh_now()
         self._charge_required = self._battery_controller.charge_total()
         self._perc_target = self._battery_controller.charge_to_perc()
 
-        _LOGGER.debug("Resetting any existing Fox Cloud force charge/min SoC settings")
-        await self._start_force_charge_off_peak()
-        await self._fox.set_min_soc(self._original_soc * 100)
-
         window = self._peak_utils.time_window()
         if self._charge_required > 0 and self._custom_charge_profile:
             hours = (window - _CHARGE_BUFFER).total_seconds() / 3600
@@ -120,8 +126,15 @@ class ChargeService(UnloadController):
         else:
             self._target_charge_amps = self._user_charge_amps
 
-        _LOGGER.debug("Charge rate set to %dA for %s", self._target_charge_amps, window)
-        await self._fox.set_charge_current(self._target_charge_amps)
+        async with self._fox.batch():
+            _LOGGER.debug("Resetting any existing Fox force charge/min SoC settings")
+            await self._start_force_charge_off_peak()
+            await self._fox.set_min_soc(self._original_soc * 100)
+
+            _LOGGER.debug(
+                "Charge rate set to %dA for %s", self._target_charge_amps, window
+            )
+            await self._fox.set_charge_current(self._target_charge_amps)
 
     async def _eco_start(self, *args) -> None:  # pylint: disable=unused-argument
         """Eco start"""
@@ -156,38 +169,54 @@ class ChargeService(UnloadController):
 
         self._stop_listening()
 
-        # Reset Fox force charge to enabled and reset charge current
-        await self._start_force_charge_off_peak()
-        await self._fox.set_charge_current(self._user_charge_amps)
+        async with self._fox.batch():
+            # Reset Fox force charge to enabled and reset charge current
+            await self._start_force_charge_off_peak()
+            await self._fox.set_charge_current(self._user_charge_amps)
 
-        _LOGGER.debug("Releasing SoC hold")
-        await self._fox.set_min_soc(self._original_soc * 100)
+            _LOGGER.debug("Releasing SoC hold")
+            await self._fox.set_min_soc(self._original_soc * 100)
 
     async def _battery_soc_change(
         self, entity, old_state, new_state
     ):  # pylint: disable=unused-argument
-        new_state = float(new_state.state)
-
-        if self._custom_charge_profile and new_state > 90:
-            step_down_charge = round(
-                ((100 - new_state) / 10) * self._user_charge_amps, 2
-            )
-            target_charge_amps = max(
-                [_MINIMUM_CHARGE, min([step_down_charge, self._target_charge_amps])]
-            )
-            await self._fox.set_charge_current(target_charge_amps)
-
-        # don't stop a force charge if it's targeted to 100% to aid battery balancing
-        if (new_state >= self._perc_target) and self._charge_active:
-            if self._perc_target != 100:
-                await self._stop_force_charge()
-        elif (
-            new_state < (self._perc_target - _CHARGE_HYSTERESIS)
-            and not self._charge_active
-        ):
-            await self._start_force_charge_off_peak()
+        if self._telemetry is not None and self._telemetry.fresh():
+            # SoC changes arrive from the telemetry poller
+            return
+        await self._soc_change(float(new_state.state))
+
+    @callback
+    def _telemetry_soc_change(self, soc: float) -> None:
+        """SoC read from the inverter"""
+        if self._telemetry_listening:
+            self._hass.async_create_task(self._soc_change(soc))
+
+    async def _soc_change(self, new_state: float) -> None:
+        """Start or stop charging as the SoC changes"""
+        async with self._fox.batch():
+            if self._custom_charge_profile and new_state > 90:
+                step_down_charge = round(
+                    ((100 - new_state) / 10) * self._user_charge_amps, 2
+                )
+                target_charge_amps = max(
+                    [_MINIMUM_CHARGE, min([step_down_charge, self._target_charge_amps])]
+                )
+                await self._fox.set_charge_current(target_charge_amps)
+
+            # don't stop a force charge if it's targeted to 100% to aid battery balancing
+            if (new_state >= self._perc_target) and self._charge_active:
+                if self._perc_target != 100:
+                    await self._stop_force_charge()
+            elif (
+                new_state < (self._perc_target - _CHARGE_HYSTERESIS)
+                and not self._charge_active
+            ):
+                await self._start_force_charge_off_peak()
 
     def _start_listening(self):
+        # the sensor is still followed whilst telemetry is stale
+        self._telemetry_listening = self._telemetry is not None
+
         # Setup trigger to stop charge when target percentage is met
         track_charge = async_track_state_change(
             self._hass,
@@ -198,6 +227,8 @@ class ChargeService(UnloadController):
         self._unload_listeners.append(track_charge)
 
     def _stop_listening(self):
+        self._telemetry_listening = False
+
         # Stop listening for updates
         self._cancel_listener()
         # Remove any dangling references in unload listeners
@@ -210,6 +241,7 @@ class ChargeService(UnloadController):
 
         if status:
             self.unload()
+            self._forecast_controller.reserve_refresh(None)
             asyncio.run_coroutine_threadsafe(
                 self._fox.stop_force_charge(), self._hass.loop
             )
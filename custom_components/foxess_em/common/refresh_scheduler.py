@@ -0,0 +1,126 @@
+"""Refresh scheduler"""
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+from typing import Any, Callable
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+_LOGGER = logging.getLogger(__name__)
+_DEBOUNCE = 2
+
+
+class RefreshScheduler:
+    """Coalesce refresh triggers and run the refresh off the event loop"""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        name: str,
+        job: Callable[[], Any],
+        on_done: Callable[[Any], None],
+        min_interval: float,
+    ) -> None:
+        """Init"""
+        self._hass = hass
+        self._job = job
+        self._on_done = on_done
+        self._min_interval = min_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._cancel_queued = None
+        self._queued_at = None
+        self._running = False
+        self._rerun = False
+        self._last_run = None
+        self._refresh_count = 0
+        self._coalesced_count = 0
+        self._max_loop_block = 0
+
+    @callback
+    def request(self, *args) -> None:  # pylint: disable=unused-argument
+        """Queue a refresh, superseding any refresh already queued"""
+        now = time.monotonic()
+
+        if self._running:
+            # pick up the latest inputs once the current refresh finishes
+            self._coalesced_count += 1
+            self._rerun = True
+            return
+
+        if self._cancel_queued is not None:
+            # drop the queued run in favour of this newer trigger
+            self._coalesced_count += 1
+            self._cancel_queued()
+        else:
+            self._queued_at = now
+
+        delay = _DEBOUNCE
+        if self._last_run is not None:
+            delay = max(delay, self._min_interval - (now - self._last_run))
+        # never hold a refresh back for longer than the debounce/minimum interval
+        latest = self._queued_at + max(_DEBOUNCE, self._min_interval)
+        delay = max(0, min(delay, latest - now))
+
+        self._cancel_queued = async_call_later(self._hass, delay, self._async_run)
+
+    async def async_run_now(self) -> None:
+        """Run a refresh straight away, skipping the debounce, and wait for it"""
+        if self._cancel_queued is not None:
+            # the queued trigger is covered by this refresh
+            self._coalesced_count += 1
+            self._cancel_queued()
+            self._cancel_queued = None
+            self._queued_at = None
+
+        await self._async_execute()
+
+    async def async_run_job(self, job: Callable[..., Any], *args) -> Any:
+        """Run another job in the worker thread, so it never overlaps a refresh"""
+        return await self._hass.loop.run_in_executor(self._executor, job, *args)
+
+    async def _async_run(self, *args) -> None:  # pylint: disable=unused-argument
+        """Run the queued refresh in the worker thread"""
+        self._cancel_queued = None
+        self._queued_at = None
+        self._running = True
+
+        try:
+            await self._async_execute()
+        finally:
+            self._running = False
+
+        if self._rerun:
+            self._rerun = False
+            self.request()
+
+    async def _async_execute(self) -> None:
+        """Run the refresh in the worker thread and hand its result to the loop"""
+        self._last_run = time.monotonic()
+        result = await self._hass.loop.run_in_executor(self._executor, self._job)
+        self._refresh_count += 1
+
+        start = time.perf_counter()
+        self._on_done(result)
+        blocked = (time.perf_counter() - start) * 1000
+        self._max_loop_block = max(self._max_loop_block, blocked)
+
+    def stop(self) -> None:
+        """Cancel queued refreshes and stop the worker"""
+        if self._cancel_queued is not None:
+            self._cancel_queued()
+            self._cancel_queued = None
+        self._executor.shutdown(wait=False)
+
+    def refresh_count(self) -> int:
+        """Number of completed refreshes"""
+        return self._refresh_count
+
+    def coalesced_count(self) -> int:
+        """Number of triggers merged into another refresh"""
+        return self._coalesced_count
+
+    def max_loop_block(self) -> float:
+        """Worst case time spent on the event loop by a refresh (ms)"""
+        return round(self._max_loop_block, 2)
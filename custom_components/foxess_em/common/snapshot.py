@@ -0,0 +1,149 @@
+"""Model snapshot"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any
+
+from homeassistant.const import EVENT_HOMEASSISTANT_FINAL_WRITE
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+import numpy as np
+
+from ..const import DOMAIN
+from .unload_controller import UnloadController
+
+_LOGGER = logging.getLogger(__name__)
+_SCHEMA_VERSION = 3
+_SAVE_DELAY = 300
+
+
+class Snapshot(UnloadController):
+    """Resampled inputs and the battery model persisted under .storage
+
+    Each section is stored with a hash of the configuration it was built from
+    and is only restored whilst that configuration is unchanged.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, entry_id: str, inputs: dict[str, Any]
+    ) -> None:
+        """Init with the configuration inputs of each section"""
+        self._hass = hass
+        self._path = hass.config.path(".storage", f"{DOMAIN}.{entry_id}.npz")
+        self._hashes = {section: self._hash(value) for section, value in inputs.items()}
+        self._restored = {}
+        self._sources = {}
+        self._sections = None
+        self._cancel_save = None
+
+        UnloadController.__init__(self)
+        final_write = hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_FINAL_WRITE, self._async_final_write
+        )
+        self._unload_listeners.append(final_write)
+        self._unload_listeners.append(self._cancel)
+
+    async def async_load(self) -> None:
+        """Read the snapshot, keeping sections with unchanged inputs"""
+        try:
+            arrays = await self._hass.async_add_executor_job(self._read)
+        except FileNotFoundError:
+            return
+        except Exception as ex:
+            _LOGGER.warning(f"Ignoring unreadable snapshot: {ex!r}")
+            return
+
+        if arrays.get("schema") != _SCHEMA_VERSION:
+            _LOGGER.debug("Ignoring snapshot with an old schema")
+            return
+
+        for key, value in arrays.items():
+            section, _, name = key.partition(".")
+            if section in self._hashes:
+                self._restored.setdefault(section, {})[name] = value
+
+        for section in list(self._restored):
+            if self._restored[section].pop("hash", None) != self._hashes[section]:
+                _LOGGER.debug(f"Snapshot {section} inputs changed, ignoring")
+                self._restored.pop(section)
+
+    @callback
+    def restore(self, sources: dict[str, Any]) -> None:
+        """Restore sections into their sources, which are saved from now on"""
+        self._sources = sources
+
+        for section, arrays in self._restored.items():
+            try:
+                sources[section].restore(arrays)
+                _LOGGER.debug(f"Restored {section} from snapshot")
+            except Exception as ex:
+                _LOGGER.warning(f"Unable to restore {section} from snapshot: {ex!r}")
+
+        self._restored = {}
+
+    @callback
+    def update_callback(self) -> None:
+        """Capture the sources after a battery refresh and queue a save"""
+        self._sections = {}
+        for section, source in self._sources.items():
+            arrays = source.snapshot()
+            if arrays is not None:
+                self._sections[section] = arrays
+
+        if self._cancel_save is None:
+            self._cancel_save = async_call_later(
+                self._hass, _SAVE_DELAY, self._async_save
+            )
+
+    async def _async_save(self, *args) -> None:  # pylint: disable=unused-argument
+        """Write the last captured sections"""
+        self._cancel_save = None
+
+        if self._sections:
+            await self._hass.async_add_executor_job(self._write, self._sections)
+
+    async def _async_final_write(self, *args) -> None:
+        """Save pending changes before shutdown"""
+        if self._cancel_save is not None:
+            self._cancel()
+            await self._async_save()
+
+    def _cancel(self) -> None:
+        """Cancel a queued save"""
+        if self._cancel_save is not None:
+            self._cancel_save()
+            self._cancel_save = None
+
+    def _read(self) -> dict[str, Any]:
+        """Read all arrays, runs in the executor"""
+        with np.load(self._path, allow_pickle=False) as data:
+            return {
+                key: value.item() if value.ndim == 0 else value
+                for key, value in data.items()
+            }
+
+    def _write(self, sections: dict[str, dict[str, np.ndarray]]) -> None:
+        """Atomically replace the snapshot, runs in the executor"""
+        arrays = {"schema": np.array(_SCHEMA_VERSION)}
+        for section, values in sections.items():
+            arrays[f"{section}.hash"] = np.array(self._hashes[section])
+            for name, value in values.items():
+                arrays[f"{section}.{name}"] = np.asarray(value)
+
+        temp = f"{self._path}.tmp"
+        try:
+            with open(temp, "wb") as file:
+                np.savez(file, **arrays)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp, self._path)
+        except OSError as ex:
+            _LOGGER.error(f"Unable to save snapshot: {ex!r}")
+
+    @staticmethod
+    def _hash(inputs: Any) -> str:
+        """Stable hash of configuration inputs"""
+        encoded = json.dumps(inputs, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
@@ -5,6 +5,7 @@ import logging
 from typing import Any
 
 from homeassistant import config_entries
+from homeassistant.components.recorder import get_instance, statistics
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import callback
 from homeassistant.helpers import config_validation as cv, selector
@@ -19,9 +20,11 @@ from ..foxess_em.const import DAWN_BUFFER, DAY_BUFFER, MIN_SOC
 from .const import (
     AUX_POWER,
     BATTERY_CAPACITY,
+    BATTERY_REFRESH_INTERVAL,
     BATTERY_SOC,
     BATTERY_VOLTS,
     CHARGE_AMPS,
+    CHARGE_CONFIDENCE,
     CONNECTION_TYPE,
     DOMAIN,
     ECO_END_TIME,
@@ -34,13 +37,23 @@ from .const import (
     FOX_MODBUS_SLAVE,
     FOX_MODBUS_TCP,
     HOUSE_POWER,
+    LOAD_DAYS,
+    LOAD_STATISTICS,
+    LOAD_WEEKDAY_SPLIT,
+    MODBUS_PROXY_HOST,
+    MODBUS_PROXY_PORT,
     SOLCAST_API_KEY,
+    SOLCAST_API_LIMIT,
     SOLCAST_URL,
+    TELEMETRY_DISABLED,
+    TELEMETRY_FAMILY,
+    TELEMETRY_INTERVAL,
 )
 from .forecast.solcast_api import SolcastApiClient
 from .fox.fox_cloud_api import FoxCloudApiClient
 from .fox.fox_cloud_service import FoxCloudService
 from .fox.fox_modbus_service import FoxModbuservice
+from .telemetry.register_map import REGISTER_MAPS
 
 _TITLE = "FoxESS - Energy Management"
 
@@ -73,6 +86,10 @@ class BatteryManagerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                     SOLCAST_API_KEY,
                     default=self._data.get(SOLCAST_API_KEY, ""),
                 ): cv.string,
+                vol.Required(
+                    SOLCAST_API_LIMIT,
+                    default=self._data.get(SOLCAST_API_LIMIT, 10),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=1000)),
             }
         )
 
@@ -154,6 +171,14 @@ class BatteryManagerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                     MIN_SOC,
                     default=self._data.get(MIN_SOC, 0.11) * 100,
                 ): vol.All(vol.Coerce(float), vol.Range(min=10, max=99)),
+                vol.Optional(
+                    BATTERY_REFRESH_INTERVAL,
+                    default=self._data.get(BATTERY_REFRESH_INTERVAL, 10),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=300)),
+                vol.Optional(
+                    CHARGE_CONFIDENCE,
+                    default=self._data.get(CHARGE_CONFIDENCE, 90),
+                ): vol.All(vol.Coerce(float), vol.Range(min=50, max=99)),
             }
         )
 
@@ -166,6 +191,24 @@ class BatteryManagerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                 BATTERY_VOLTS,
                 default=self._data.get(BATTERY_VOLTS, 208),
             ): vol.All(vol.Coerce(float), vol.Range(min=1, max=2000)),
+            vol.Optional(
+                TELEMETRY_FAMILY,
+                default=self._data.get(TELEMETRY_FAMILY, TELEMETRY_DISABLED),
+            ): sel(
+                {"select": {"options": [TELEMETRY_DISABLED, *REGISTER_MAPS.keys()]}}
+            ),
+            vol.Optional(
+                TELEMETRY_INTERVAL,
+                default=self._data.get(TELEMETRY_INTERVAL, 10),
+            ): vol.All(vol.Coerce(float), vol.Range(min=2, max=300)),
+            vol.Optional(
+                MODBUS_PROXY_HOST,
+                default=self._data.get(MODBUS_PROXY_HOST, "127.0.0.1"),
+            ): str,
+            vol.Optional(
+                MODBUS_PROXY_PORT,
+                default=self._data.get(MODBUS_PROXY_PORT, 0),
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=65535)),
         }
 
         self._power_schema = vol.Schema(
@@ -188,6 +231,18 @@ class BatteryManagerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                 ): selector.EntitySelector(
                     selector.EntitySelectorConfig(domain="sensor", multiple=True)
                 ),
+                vol.Optional(
+                    LOAD_STATISTICS,
+                    default=self._data.get(LOAD_STATISTICS, False),
+                ): bool,
+                vol.Optional(
+                    LOAD_DAYS,
+                    default=self._data.get(LOAD_DAYS, 14),
+                ): vol.All(vol.Coerce(int), vol.Range(min=7, max=28)),
+                vol.Optional(
+                    LOAD_WEEKDAY_SPLIT,
+                    default=self._data.get(LOAD_WEEKDAY_SPLIT, False),
+                ): bool,
             }
         )
 
@@ -350,10 +405,19 @@ class BatteryManagerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     async def async_step_power(self, user_input: dict[str, Any] = None):
         """Handle a flow initialized by the user."""
         if user_input is not None:
-            self._user_input.update(user_input)
-            return self.async_create_entry(title=_TITLE, data=self._user_input)
+            sensors = [user_input[HOUSE_POWER], *user_input.get(AUX_POWER, [])]
+            if not user_input.get(LOAD_STATISTICS) or await self._test_statistics(
+                sensors
+            ):
+                self._errors["base"] = None
+                self._user_input.update(user_input)
+                return self.async_create_entry(title=_TITLE, data=self._user_input)
+            else:
+                self._errors["base"] = "statistics_missing"
 
-        return self.async_show_form(step_id="power", data_schema=self._power_schema)
+        return self.async_show_form(
+            step_id="power", data_schema=self._power_schema, errors=self._errors
+        )
 
     def _parse_time(self, eco_start, eco_end):
         try:
@@ -394,8 +458,20 @@ class BatteryManagerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             pass
         return False
 
+    async def _test_statistics(self, sensors: list[str]):
+        """Return true if long-term statistics are recorded for every sensor"""
+        recorded = await get_instance(self.hass).async_add_executor_job(
+            statistics.list_statistic_ids, self.hass, set(sensors)
+        )
+        missing = set(sensors) - {item["statistic_id"] for item in recorded}
+        if len(missing) > 0:
+            _LOGGER.warning(f"No long-term statistics for {', '.join(sorted(missing))}")
+            return False
+        return True
+
     async def _test_fox_modbus(self, conn_type, host, slave):
         """Return true if modbus connection can be established"""
+        client = None
         try:
             params = {CONNECTION_TYPE: conn_type}
             if conn_type == FOX_MODBUS_TCP:
@@ -408,6 +484,9 @@ class BatteryManagerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         except ModbusException as ex:
             _LOGGER.warning(f"{ex!r}")
             self._errors["base"] = "modbus_error"
+        finally:
+            if client is not None:
+                await client.close()
         return False
 
     @staticmethod
@@ -24,11 +24,10 @@ ATTR_ENTRY_TYPE = "entry_type"
 # Configuration and options
 SOLCAST_API_KEY = "key"
 SOLCAST_SCAN_INTERVAL = "scan_interval"
+SOLCAST_API_LIMIT = "solcast_api_limit"
 # SOLCAST_URL = "https://364c31d2-231a-4a41-a7ee-6b0f357fdb75.mock.pstmn.io"
 SOLCAST_URL = "https://api.solcast.com.au"
 
-FORECAST = "sensor.foxess_em_forecast"
-
 # Fox Options
 CONNECTION_TYPE = "connection_type"
 FOX_MODBUS_TCP = "Modbus TCP"
@@ -51,6 +50,17 @@ BATTERY_CAPACITY = "capacity"
 BATTERY_SOC = "battery_soc"
 CHARGE_AMPS = "charge_amps"
 BATTERY_VOLTS = "battery_volts"
+BATTERY_REFRESH_INTERVAL = "battery_refresh_interval"
+LOAD_STATISTICS = "load_statistics"
+LOAD_DAYS = "load_days"
+LOAD_WEEKDAY_SPLIT = "load_weekday_split"
+CHARGE_CONFIDENCE = "charge_confidence"
+TELEMETRY_FAMILY = "telemetry_family"
+TELEMETRY_INTERVAL = "telemetry_interval"
+TELEMETRY_DISABLED = "Disabled"
+TELEMETRY_H1 = "H1"
+MODBUS_PROXY_HOST = "modbus_proxy_host"
+MODBUS_PROXY_PORT = "modbus_proxy_port"
 
 
 # Connection types
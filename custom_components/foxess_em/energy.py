@@ -23,10 +23,7 @@ async def async_get_solar_forecast(hass: HomeAssistant, config_entry_id: str) ->
         return None
 
     try:
-        energy = controller.energy()
-        energy_dict = dict(zip(energy.period_start_iso, energy.pv_watts))
-
-        return {"wh_hours": energy_dict}
+        return controller.solar_forecast()
 
     except Exception:
         return None
@@ -0,0 +1,98 @@
+"""Solcast API ledger"""
+
+import asyncio
+from datetime import datetime, timezone
+import logging
+
+from homeassistant.const import (
+    MAJOR_VERSION as HA_MAJOR_VERSION,
+    MINOR_VERSION as HA_MINOR_VERSION,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from ..const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+_STORAGE_VERSION = 1
+_STORAGE_KEY = f"{DOMAIN}.api_ledger"
+
+
+class ApiLedger:
+    """Solcast API calls made per UTC day persisted under .storage
+
+    Calls are recorded before they are made, so the daily limit holds across
+    restarts.
+    """
+
+    def __init__(self, hass: HomeAssistant, limit: int) -> None:
+        """Init with the daily API limit"""
+        if HA_MAJOR_VERSION > 2022 or (
+            HA_MAJOR_VERSION == 2022 and HA_MINOR_VERSION >= 4
+        ):
+            # 2022.4 adds atomic writes to the store
+            self._store = Store(
+                hass, _STORAGE_VERSION, _STORAGE_KEY, atomic_writes=True
+            )
+        else:
+            self._store = Store(hass, _STORAGE_VERSION, _STORAGE_KEY)
+        self._limit = limit
+        self._day = None
+        self._calls = 0
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    async def async_load(self) -> None:
+        """Read the calls made today"""
+        async with self._lock:
+            await self._async_load()
+
+    async def async_acquire(self, calls: int = 1) -> bool:
+        """Record calls about to be made, False if they would exceed the limit"""
+        async with self._lock:
+            await self._async_load()
+
+            if self.calls() + calls > self._limit:
+                _LOGGER.debug(f"Solcast API limit of {self._limit} calls reached")
+                return False
+
+            self._calls = self.calls() + calls
+            self._day = self._today()
+            await self._store.async_save({"day": self._day, "calls": self._calls})
+
+            return True
+
+    def limit(self) -> int:
+        """Daily API limit"""
+        return self._limit
+
+    def calls(self) -> int:
+        """Calls made today"""
+        if self._day != self._today():
+            return 0
+        return self._calls
+
+    def remaining(self) -> int:
+        """Calls left today"""
+        return max(self._limit - self.calls(), 0)
+
+    async def _async_load(self) -> None:
+        """Read the store once, assuming the limit is spent if unreadable"""
+        if self._loaded:
+            return
+
+        try:
+            data = await self._store.async_load()
+        except Exception as ex:
+            _LOGGER.warning(f"Unable to load the API ledger: {ex!r}")
+            data = {"day": self._today(), "calls": self._limit}
+
+        if data is not None:
+            self._day = data.get("day")
+            self._calls = data.get("calls", 0)
+        self._loaded = True
+
+    @staticmethod
+    def _today() -> str:
+        """Solcast limits reset at midnight UTC"""
+        return datetime.now(timezone.utc).date().isoformat()
@@ -1,37 +1,44 @@
 """Forecast controller"""
 
-from datetime import datetime, time, timedelta
+from datetime import datetime, time, timedelta, timezone
 import logging
 
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import async_track_utc_time_change
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.helpers.event import (
+    async_track_point_in_utc_time,
+    async_track_utc_time_change,
+)
+import numpy as np
 from pandas import DataFrame
 
 from custom_components.foxess_em.common.hass_load_controller import HassLoadController
-from custom_components.foxess_em.const import FORECAST
 
 from ..common.callback_controller import CallbackController
 from ..common.unload_controller import UnloadController
 from ..util.exceptions import NoDataError
+from .api_ledger import ApiLedger
 from .forecast_model import ForecastModel
+from .forecast_store import ForecastStore
+from .refresh_planner import RefreshPlanner
 from .solcast_api import SolcastApiClient
 
 _LOGGER = logging.getLogger(__name__)
-_CALLS = 2
-_API_BUFFER = _CALLS * 2
 _START_HOUR = 6
 _HOURS = 12
-_API_LIMIT = 10  # solcast api usage call no longer supported, this is your Api_Limit - set to 10 or 50.
 
 
 class ForecastController(UnloadController, CallbackController, HassLoadController):
     """Class to manage forecast retrieval"""
 
-    def __init__(self, hass: HomeAssistant, api: SolcastApiClient) -> None:
+    def __init__(
+        self, hass: HomeAssistant, api: SolcastApiClient, api_limit: int
+    ) -> None:
         self._hass = hass
-        self._api = ForecastModel(api)
-        self._api_count = 0
-        self._api_limit = _API_LIMIT
+        self._ledger = ApiLedger(hass, api_limit)
+        self._api = ForecastModel(api, self._ledger)
+        self._store = ForecastStore(hass)
+        self._planner = RefreshPlanner(_START_HOUR, _HOURS)
+        self._reserved = None
         self._last_update = None
         self._refresh_listeners = []
 
@@ -40,70 +47,70 @@ class ForecastController(UnloadController, CallbackController, HassLoadControlle
         CallbackController.__init__(self)
         HassLoadController.__init__(self, hass, self.load)
 
-        self._setup_reset()
+        self._setup_replan()
 
     async def load(self, *args) -> None:
-        """Load forecast from state"""
-        raw_data = self._hass.states.get(FORECAST)
-
-        if raw_data is not None and all(
-            k in raw_data.attributes for k in ("forecast", "last_update")
-        ):
-            last_update = datetime.fromisoformat(raw_data.attributes["last_update"])
-            cache_age = datetime.now().astimezone() - last_update
+        """Load forecast from the snapshot or store"""
+        await self._ledger.async_load()
+
+        stored = await self._store.async_load()
+        if stored is not None:
+            last_update, sites = stored
+            if self.ready() and last_update <= self._last_update:
+                # forecast periods were restored from the snapshot
+                self._api.load(sites, combine=False)
+            else:
+                _LOGGER.debug("Loading forecast data from store")
+                self._api.load(sites)
+                self._last_update = last_update
+
+        if self.ready() and self._last_update is not None:
+            cache_age = datetime.now().astimezone() - self._last_update
             _LOGGER.debug("Forecast cache is %s old", cache_age)
             if cache_age < timedelta(days=1):
-                _LOGGER.debug("Loading forecast data from cache")
-                forecast_data = raw_data.attributes["forecast"]
-                self._api.load(forecast_data)
-                self._last_update = last_update
-                _LOGGER.debug(
-                    "Finished loading forecast data from cache, notifying listeners"
-                )
-                await self._async_get_site_info()
+                _LOGGER.debug("Finished loading forecast data, notifying listeners")
+                await self._setup_refresh()
                 self._notify_listeners()
-            else:
-                await self.async_refresh()
-        else:
-            await self.async_refresh()
-
-    async def _setup_refresh(self, *args):
-        """Setup refresh intervals"""
-
-        self._clear_listeners()
-
-        now = datetime.now().astimezone()
-        default_start = now.replace(hour=_START_HOUR, minute=0, second=0, microsecond=0)
-        default_end = default_start + timedelta(hours=_HOURS)
-        actual_start = max(now, default_start)
+                return
 
-        sites = await self._api.sites()
+        await self.async_refresh()
 
-        sites = len(sites["sites"])
-        _LOGGER.debug(f"Creating refresh schedule for {sites} sites")
-
-        api_available = int(
-            (self._api_limit - self._api_count - _API_BUFFER) / (_CALLS * sites)
-        )
-        _LOGGER.debug(f"Calculated {api_available} available refreshes")
-
-        self._add_refresh(
-            now.replace(hour=_START_HOUR, minute=0, second=0, microsecond=0).time()
-        )
+    def reserve_refresh(self, refresh_time: time | None) -> None:
+        """Keep a daily refresh at a local time, i.e. before a charge decision"""
+        if refresh_time == self._reserved:
+            return
 
-        # default first refresh is used
-        if now < default_start:
-            api_available -= 1
+        self._reserved = refresh_time
+        if self.ready():
+            # replan today, may be called from outside the event loop
+            self._hass.add_job(self._setup_refresh)
 
-        # no api calls left or somehow landed after the final refresh
-        if api_available < 1 or now > default_end:
-            return
+    async def _setup_refresh(self, *args) -> None:  # pylint: disable=unused-argument
+        """Plan refreshes for the rest of the UTC day"""
+        try:
+            self._clear_listeners()
+
+            now = datetime.now().astimezone()
+            sites = await self._api.sites()
+            sites = len(sites["sites"])
+            _LOGGER.debug(f"Creating refresh schedule for {sites} sites")
+
+            refreshes = self._planner.refreshes(
+                now,
+                self._ledger.remaining(),
+                sites,
+                self._api.actuals_due(),
+                self._reserved,
+            )
+            _LOGGER.debug(f"Calculated {refreshes} available refreshes")
 
-        minutes_diff = int((default_end - actual_start).seconds / 60)
-        interval = int(minutes_diff / api_available)
-        for i in range(1, api_available + 1):
-            update_time = (actual_start + timedelta(minutes=interval * i)).time()
-            self._add_refresh(update_time)
+            plan = self._planner.plan(
+                now, refreshes, self._api.periods(), self._api.changes()
+            )
+            for refresh_time in plan:
+                self._add_refresh(refresh_time)
+        except Exception as ex:
+            _LOGGER.error(f"{ex!r}")
 
     def _clear_listeners(self):
         """Clear all listeners"""
@@ -115,45 +122,48 @@ class ForecastController(UnloadController, CallbackController, HassLoadControlle
                 self._unload_listeners.remove(listener)
         self._refresh_listeners.clear()
 
-    def _add_refresh(self, refresh_time: time) -> None:
+    def _add_refresh(self, refresh_time: datetime) -> None:
         """Add a forecast refresh"""
-        _LOGGER.debug(f"Setting up forecast refresh at {refresh_time}")
+        _LOGGER.debug(f"Setting up forecast refresh at {refresh_time.astimezone()}")
 
-        forecast_update = async_track_utc_time_change(
-            self._hass,
-            self.async_refresh,
-            hour=refresh_time.hour,
-            minute=refresh_time.minute,
-            second=0,
-            local=True,
+        forecast_update = async_track_point_in_utc_time(
+            self._hass, self.async_refresh, refresh_time
         )
         self._refresh_listeners.append(forecast_update)
         self._unload_listeners.append(forecast_update)
 
-    def _setup_reset(self, *args) -> None:
-        """Setup refresh intervals"""
-        # Reset # of API calls at midnight UTC
-        reset_api = async_track_utc_time_change(
+    def _setup_replan(self) -> None:
+        """Plan the new day's refreshes once the API limit resets"""
+        replan = async_track_utc_time_change(
             self._hass,
-            self._reset_api_count,
+            self._setup_refresh,
             hour=0,
             minute=0,
             second=10,
             local=False,
         )
-        self._unload_listeners.append(reset_api)
+        self._unload_listeners.append(replan)
 
     def ready(self) -> bool:
         """Model status"""
         return self._api.ready()
 
-    async def async_refresh(self, *args) -> None:  # pylint: disable=unused-argument
+    async def async_refresh_forecast(self, call: ServiceCall) -> None:
+        """Refresh forecast on demand"""
+        await self.async_refresh(estimated_actuals=call.data["estimated_actuals"])
+
+    async def async_refresh(
+        self, *args, estimated_actuals: bool = False
+    ) -> None:  # pylint: disable=unused-argument
         """Refresh forecast"""
         try:
             _LOGGER.debug("Refreshing forecast data")
+            if self._ledger.remaining() == 0:
+                raise NoDataError("Solcast API limit reached, using the last forecast")
 
-            await self._api.refresh()
+            await self._api.refresh(estimated_actuals)
             self._last_update = datetime.now().astimezone()
+            await self._store.async_save(self._last_update, self._api.site_data())
 
             _LOGGER.debug("Finished refreshing forecast data")
         except NoDataError as ex:
@@ -161,36 +171,37 @@ class ForecastController(UnloadController, CallbackController, HassLoadControlle
         except Exception as ex:
             _LOGGER.error(f"{ex!r}")
 
-        await self._async_get_site_info()
+        await self._setup_refresh()
         self._notify_listeners()
 
-    async def _async_get_site_info(
-        self, *args
-    ) -> None:  # pylint: disable=unused-argument
-        """Refresh site info"""
-        try:
-            _LOGGER.debug("Setting Solcast site info")
-            self._api_limit = (
-                _API_LIMIT  # this api_call no longer works, assume api_limit
-            )
-            _LOGGER.debug(f"API Limit {self._api_limit}")
+    def snapshot(self) -> dict[str, np.ndarray] | None:
+        """Raw and resampled forecast for the snapshot"""
+        if not self.ready() or self._last_update is None:
+            return None
 
-            await self._setup_refresh()
+        return {
+            **self._api.snapshot(),
+            "last_update": np.array(self._last_update.timestamp()),
+        }
 
-        except Exception as ex:
-            _LOGGER.error(f"{ex!r}")
+    def restore(self, arrays: dict[str, np.ndarray]) -> None:
+        """Restore raw and resampled forecast from a snapshot"""
+        self._api.restore(arrays)
+        self._last_update = datetime.fromtimestamp(
+            arrays["last_update"], timezone.utc
+        ).astimezone()
 
     def resample_data(self) -> DataFrame:
         """Return resampled data"""
         return self._api.resample_data()
 
-    def raw_data(self) -> list:
-        """Return resampled data"""
-        return self._api.raw_data()
+    def version(self) -> int:
+        """Forecast version"""
+        return self._api.version()
 
-    async def _reset_api_count(self, *args) -> None:  # pylint: disable=unused-argument
-        """Reset API count to 0"""
-        self._api_count = 0
+    def forecast_end(self) -> datetime:
+        """End of the last forecast period"""
+        return self._api.forecast_end()
 
     def total_kwh_forecast_today(self) -> float:
         """Total forecast today"""
@@ -204,17 +215,29 @@ class ForecastController(UnloadController, CallbackController, HassLoadControlle
         """Return Remaining Forecasts data for today"""
         return self._api.total_kwh_forecast_today_remaining()
 
-    def energy(self) -> DataFrame:
-        """Return energy"""
-        return self._api.energy()
+    def total_kwh_forecast_next_hour(self) -> float:
+        """Forecast for the next hour"""
+        return self._api.total_kwh_forecast_next_hours(1)
+
+    def total_kwh_forecast_next_6_hours(self) -> float:
+        """Forecast for the next 6 hours"""
+        return self._api.total_kwh_forecast_next_hours(6)
+
+    def solar_forecast(self) -> dict:
+        """Energy platform solar forecast, cached per forecast"""
+        return self._api.solar_forecast()
+
+    def energy(self, minutes: int = 60) -> tuple[np.ndarray, np.ndarray]:
+        """Epoch second start and Wh of each window across the forecast"""
+        return self._api.energy(minutes)
 
     def last_update(self) -> datetime:
         """Return last update time"""
         return self._last_update
 
     def api_count(self) -> int:
-        """Return API count"""
-        return self._api_count
+        """Return API calls made today"""
+        return self._ledger.calls()
 
     def empty(self) -> int:
         """Hack for hidden sensors"""
@@ -1,47 +1,177 @@
 """Forecast model"""
 
-from datetime import datetime, timedelta
+import asyncio
+from datetime import datetime, time, timedelta, timezone
 import logging
 
+import numpy as np
 import pandas as pd
 
 from ..forecast.solcast_api import SolcastApiClient
 from ..util.exceptions import NoDataError
+from .api_ledger import ApiLedger
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
+_SITE_FETCHES = 2
+_HISTORY_HOURS = 120
+_ESTIMATES = ("pv_estimate", "pv_estimate10", "pv_estimate90")
+_COLUMNS = {
+    "period_start": np.int64,
+    "period_end": np.int64,
+    **{column: float for column in _ESTIMATES},
+}
 
 
 class ForecastModel:
-    """Forecast model"""
+    """Forecast model
 
-    def __init__(self, api: SolcastApiClient) -> None:
+    Each site keeps a rolling timeline of periods, new estimates replace the
+    overlapping periods and estimated actuals are only fetched once a day.
+    Every fetch is recorded against the daily API limit before it is made.
+    """
+
+    def __init__(self, api: SolcastApiClient, ledger: ApiLedger) -> None:
         """Solcast API"""
-        self._raw_data = []
-        self._resampled = {}
+        self._sites = {}
+        self._periods = {}
+        self._changes = {}
+        self._cumulative = None
+        self._solar_forecast = None
         self._api = api
+        self._ledger = ledger
         self._ready = False
+        self._version = 0
 
     def ready(self) -> bool:
         """Model status"""
         return self._ready
 
-    def load(self, raw_data) -> None:
-        """Load data"""
-        self._raw_data = raw_data
-        self._resampled = self._resample(self._raw_data)
-
-        self._ready = True
+    def version(self) -> int:
+        """Incremented whenever the forecast changes"""
+        return self._version
 
-    async def refresh(self) -> None:
-        """Get data from the API"""
+    def load(self, sites: dict[str, dict], combine: bool = True) -> None:
+        """Load site timelines, combining them unless already restored"""
+        self._sites = sites
+        if not combine:
+            return
 
-        sites = await self._api.async_get_sites()
+        self._set_periods(self._combine(self._sites))
 
-        self._raw_data = []
-        for site in sites["sites"]:
-            self._raw_data += await self._api.async_get_data(site["resource_id"])
+    async def refresh(self, estimated_actuals: bool = False) -> None:
+        """Get data from the API, estimated actuals once a day unless forced"""
 
-        self._resampled = self._resample(self._raw_data)
+        sites = await self._api.async_get_sites()
+        if sites is None or len(sites["sites"]) == 0:
+            raise NoDataError("No Solcast sites available")
+
+        # fetch sites concurrently, limited to avoid bursts against the API
+        semaphore = asyncio.Semaphore(_SITE_FETCHES)
+        today = datetime.now().astimezone().date().isoformat()
+        site_ids = [site["resource_id"] for site in sites["sites"]]
+        site_data = await asyncio.gather(
+            *[
+                self._site_data(site_id, semaphore, today, estimated_actuals)
+                for site_id in site_ids
+            ]
+        )
+        self._sites = dict(zip(site_ids, site_data))
+
+        periods = self._combine(self._sites)
+        self._changes = self._changed(self._periods, periods)
+        self._set_periods(periods)
+
+    async def _site_data(
+        self,
+        site_id: str,
+        semaphore: asyncio.Semaphore,
+        today: str,
+        estimated_actuals: bool,
+    ) -> dict:
+        """Merged site timeline, falling back to the last good timeline"""
+        site = self._sites.get(site_id)
+        fetch_actuals = (
+            estimated_actuals or site is None or site["estimated_actuals"] != today
+        )
+
+        try:
+            async with semaphore:
+                if not await self._ledger.async_acquire():
+                    raise NoDataError("Solcast API limit reached")
+                requests = [self._api.async_get_forecasts(site_id)]
+                if fetch_actuals:
+                    fetch_actuals = await self._ledger.async_acquire()
+                if fetch_actuals:
+                    requests.append(self._api.async_get_estimated_actuals(site_id))
+                forecasts, *actuals = await asyncio.gather(*requests)
+        except Exception as ex:
+            if site is None:
+                raise
+            _LOGGER.warning(f"Using cached forecast for site {site_id}: {ex!r}")
+            return site
+
+        columns = site if site is not None else self._empty()
+        if fetch_actuals:
+            columns = self._merge(columns, actuals[0])
+        columns = self._merge(columns, forecasts)
+
+        # actuals are skipped when the limit only allowed the forecast
+        fetched = site["estimated_actuals"] if site is not None else None
+        if fetch_actuals:
+            fetched = today
+
+        # drop periods older than the estimated actuals horizon
+        oldest = datetime.now().timestamp() - _HISTORY_HOURS * 3600
+        keep = columns["period_end"] > oldest
+
+        return {
+            "estimated_actuals": fetched,
+            **{column: columns[column][keep] for column in _COLUMNS},
+        }
+
+    def snapshot(self) -> dict[str, np.ndarray]:
+        """Forecast periods for the snapshot"""
+        return self._periods
+
+    def restore(self, arrays: dict[str, np.ndarray]) -> None:
+        """Restore forecast periods from a snapshot"""
+        self._set_periods(
+            {column: arrays[column] for column in ("period_start", *_ESTIMATES)}
+        )
+
+    def periods(self) -> dict[str, np.ndarray]:
+        """Forecast periods summed across sites"""
+        return self._periods
+
+    def changes(self) -> dict[str, np.ndarray]:
+        """Change in each period between the last two refreshes (kW)"""
+        return self._changes
+
+    def actuals_due(self) -> int:
+        """Sites yet to fetch today's estimated actuals"""
+        today = datetime.now().astimezone().date().isoformat()
+        return sum(site["estimated_actuals"] != today for site in self._sites.values())
+
+    def _set_periods(self, periods: dict[str, np.ndarray]) -> None:
+        """Replace the forecast periods and their cumulative energy"""
+        self._periods = periods
+        self._cumulative = None
+        self._solar_forecast = None
+        if len(periods["period_start"]) > 0:
+            minute = self._minutes()
+            self._cumulative = (
+                int(minute[0]),
+                np.concatenate(([0], np.cumsum(self._minute_energy(minute)))),
+            )
+            # energy dashboard payload, the dashboard aggregates hourly
+            starts, wh = self.energy(60)
+            self._solar_forecast = {
+                "wh_hours": {
+                    datetime.fromtimestamp(start, timezone.utc).isoformat(): value
+                    for start, value in zip(starts.tolist(), wh.tolist())
+                }
+            }
+        self._version += 1
 
         self._ready = True
 
@@ -53,67 +183,163 @@ class ForecastModel:
         """Return number of API calls"""
         return await self._api.async_get_api_calls()
 
-    def raw_data(self) -> list:
-        """Return raw data"""
-        if len(self._raw_data) == 0:
+    def site_data(self) -> dict[str, dict]:
+        """Return site timelines, period start/end in epoch seconds"""
+        if len(self._sites) == 0:
             raise NoDataError("No forecast data available")
-        return self._raw_data
+        return self._sites
+
+    def forecast_end(self) -> datetime | None:
+        """End of the last forecast period"""
+        ends = [
+            site["period_end"].max()
+            for site in self._sites.values()
+            if len(site["period_end"]) > 0
+        ]
+        if len(ends) == 0:
+            return None
+
+        return datetime.fromtimestamp(int(max(ends)), timezone.utc).astimezone()
 
     def resample_data(self) -> pd.DataFrame:
-        """Return resampled data"""
-        if len(self._resampled) == 0:
-            raise NoDataError("No forecast data available")
-        return self._resampled
+        """Per minute forecast"""
+        minute = self._minutes()
+        df = pd.DataFrame(
+            {
+                "period_start": pd.to_datetime(minute * 60, unit="s", utc=True),
+                **{
+                    column: self._minute_energy(minute, column) for column in _ESTIMATES
+                },
+            }
+        )
+        df["time"] = df["period_start"].dt.time
+
+        return df
 
     def total_kwh_forecast_today(self) -> float:
         """Total forecast today"""
         date_now = datetime.now().astimezone()
-        f_df = self._resampled
-        filtered = f_df[f_df["date"] == date_now.date()]
+        start = self._day_minute(date_now)
 
-        return round(filtered.pv_estimate.sum(), 2)
+        return round(self._energy(start, start + 1440), 2)
 
     def total_kwh_forecast_tomorrow(self) -> float:
         """Total forecast tomorrow"""
         date_tomorrow = datetime.now().astimezone() + timedelta(days=1)
-        f_df = self._resampled
-        filtered = f_df[f_df["date"] == date_tomorrow.date()]
+        start = self._day_minute(date_tomorrow)
 
-        return round(filtered.pv_estimate.sum(), 2)
+        return round(self._energy(start, start + 1440), 2)
 
     def total_kwh_forecast_today_remaining(self) -> float:
         """Return Remaining Forecasts data for today"""
         date_now = datetime.now().astimezone()
-        forecast = self._resampled
-        forecast = forecast[
-            (forecast["period_start"] >= date_now)
-            & (forecast["date"] == date_now.date())
-        ]
+        start = self._day_minute(date_now)
+        now = int(np.ceil(date_now.timestamp() / 60))
+
+        return round(self._energy(max(start, now), start + 1440), 2)
 
-        return round(forecast.pv_estimate.sum(), 2)
+    def total_kwh_forecast_next_hours(self, hours: int) -> float:
+        """Forecast for the next hours"""
+        now = int(np.ceil(datetime.now().timestamp() / 60))
 
-    def energy(self) -> pd.DataFrame:
-        """Return energy"""
-        return self._resampled
+        return round(self._energy(now, now + hours * 60), 2)
 
-    def _resample(self, values) -> pd.DataFrame:
-        """Resample values"""
-        df = pd.DataFrame.from_dict(values)
-        df["period_start"] = pd.to_datetime(df["period_start"])
-        df["period_end"] = pd.to_datetime(df["period_end"])
+    def energy(self, minutes: int = 60) -> tuple[np.ndarray, np.ndarray]:
+        """Epoch second start and Wh of each window across the forecast"""
+        minute = self._minutes()
+        windows = minute // minutes
+        starts, positions = np.unique(windows, return_inverse=True)
+        wh = np.bincount(positions, weights=self._minute_energy(minute)) * 1000
 
-        df = df.groupby("period_start").sum(numeric_only=True)
-        df["period_start"] = df.index.values
+        return starts * minutes * 60, wh
 
-        df = df.set_index("period_start").resample("1Min").mean().interpolate("linear")
+    def solar_forecast(self) -> dict:
+        """Energy platform solar forecast"""
+        if self._solar_forecast is None:
+            raise NoDataError("No forecast data available")
+        return self._solar_forecast
 
-        df["period_start"] = pd.to_datetime(df.index.values, utc=True)
-        df["period_start_iso"] = df["period_start"].map(lambda x: x.isoformat())
-        df["pv_estimate"] = df["pv_estimate"] / 60
-        df["pv_watts"] = df["pv_estimate"] * 1000
-        df["time"] = df.index.time
-        df["date"] = df.index.date
+    def _minutes(self) -> np.ndarray:
+        """Epoch minutes from the first to the last period start"""
+        if len(self._periods) == 0 or len(self._periods["period_start"]) == 0:
+            raise NoDataError("No forecast data available")
 
-        df = df.sort_index()
+        period_start = self._periods["period_start"]
+        return np.arange(period_start[0] // 60, period_start[-1] // 60 + 1)
+
+    def _minute_energy(
+        self, minute: np.ndarray, column: str = "pv_estimate"
+    ) -> np.ndarray:
+        """kWh of each minute, linearly interpolated between period starts"""
+        return (
+            np.interp(minute * 60, self._periods["period_start"], self._periods[column])
+            / 60
+        )
+
+    def _energy(self, start: int, end: int) -> float:
+        """kWh of the forecast minutes between two epoch minutes"""
+        if self._cumulative is None:
+            raise NoDataError("No forecast data available")
 
-        return df
+        first, cumulative = self._cumulative
+        start = min(max(start - first, 0), len(cumulative) - 1)
+        end = min(max(end - first, start), len(cumulative) - 1)
+
+        return float(cumulative[end] - cumulative[start])
+
+    def _day_minute(self, date: datetime) -> int:
+        """First epoch minute of the UTC day of a date"""
+        day = datetime.combine(date.date(), time(), tzinfo=timezone.utc)
+        return int(day.timestamp()) // 60
+
+    def _combine(self, sites: dict[str, dict]) -> dict[str, np.ndarray]:
+        """Sum sites into a single set of periods"""
+        period_start = np.concatenate([site["period_start"] for site in sites.values()])
+        period_start, positions = np.unique(period_start, return_inverse=True)
+
+        return {
+            "period_start": period_start,
+            **{
+                column: np.bincount(
+                    positions,
+                    weights=np.concatenate([site[column] for site in sites.values()]),
+                    minlength=len(period_start),
+                )
+                for column in _ESTIMATES
+            },
+        }
+
+    def _changed(
+        self, previous: dict[str, np.ndarray], periods: dict[str, np.ndarray]
+    ) -> dict[str, np.ndarray]:
+        """Absolute change of the periods in both forecasts"""
+        if len(previous) == 0:
+            return {}
+
+        period_start, old, new = np.intersect1d(
+            previous["period_start"], periods["period_start"], return_indices=True
+        )
+
+        return {
+            "period_start": period_start,
+            "change": np.abs(
+                periods["pv_estimate"][new] - previous["pv_estimate"][old]
+            ),
+        }
+
+    def _empty(self) -> dict[str, np.ndarray]:
+        """Timeline without any periods"""
+        return {column: np.array([], dtype=dtype) for column, dtype in _COLUMNS.items()}
+
+    def _merge(
+        self, columns: dict[str, np.ndarray], new: dict[str, np.ndarray]
+    ) -> dict[str, np.ndarray]:
+        """Merge new periods into a timeline, replacing overlapping periods"""
+        keep = ~np.isin(columns["period_end"], new["period_end"])
+        merged = {
+            column: np.concatenate((columns[column][keep], new[column]))
+            for column in _COLUMNS
+        }
+        order = np.argsort(merged["period_end"], kind="stable")
+
+        return {column: merged[column][order] for column in _COLUMNS}
@@ -33,6 +33,22 @@ SENSORS: dict[str, SensorDescription] = {
         icon="mdi:solar-power",
         should_poll=True,
     ),
+    "total_kwh_forecast_next_hour": SensorDescription(
+        key="total_kwh_forecast_next_hour",
+        device_class=SensorDeviceClass.ENERGY,
+        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        name="Forecast: Next Hour",
+        icon="mdi:solar-power",
+        should_poll=True,
+    ),
+    "total_kwh_forecast_next_6_hours": SensorDescription(
+        key="total_kwh_forecast_next_6_hours",
+        device_class=SensorDeviceClass.ENERGY,
+        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        name="Forecast: Next 6 Hours",
+        icon="mdi:solar-power",
+        should_poll=True,
+    ),
     "api_count": SensorDescription(
         key="api_count",
         device_class=None,
@@ -45,8 +61,7 @@ SENSORS: dict[str, SensorDescription] = {
         icon="mdi:calendar",
         should_poll=False,
         visible=False,
-        state_attributes={"forecast": "raw_data", "last_update": "last_update"},
-        store_attributes=True,
+        state_attributes={"last_update": "last_update", "forecast_end": "forecast_end"},
     ),
 }
 
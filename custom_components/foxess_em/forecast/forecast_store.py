@@ -0,0 +1,140 @@
+"""Forecast store"""
+
+from datetime import datetime
+import logging
+
+from homeassistant.const import (
+    MAJOR_VERSION as HA_MAJOR_VERSION,
+    MINOR_VERSION as HA_MINOR_VERSION,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import restore_state
+from homeassistant.helpers.storage import Store
+import numpy as np
+import pandas as pd
+
+from ..const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+_STORAGE_VERSION = 1
+_STORAGE_KEY = f"{DOMAIN}.forecast"
+# forecasts were held in the attributes of this sensor before the store
+_LEGACY_ENTITY = "sensor.foxess_em_forecast"
+_LEGACY_SITE = "legacy"
+_COLUMNS = {
+    "period_start": np.int64,
+    "period_end": np.int64,
+    "pv_estimate": float,
+    "pv_estimate10": float,
+    "pv_estimate90": float,
+}
+
+
+class ForecastStore:
+    """Site forecast timelines persisted as columns under .storage"""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Init"""
+        self._hass = hass
+        if HA_MAJOR_VERSION > 2022 or (
+            HA_MAJOR_VERSION == 2022 and HA_MINOR_VERSION >= 4
+        ):
+            # 2022.4 adds atomic writes to the store
+            self._store = Store(
+                hass, _STORAGE_VERSION, _STORAGE_KEY, atomic_writes=True
+            )
+        else:
+            self._store = Store(hass, _STORAGE_VERSION, _STORAGE_KEY)
+
+    async def async_load(self) -> tuple[datetime, dict[str, dict]] | None:
+        """Last update and site timelines, if stored"""
+        try:
+            data = await self._store.async_load()
+        except Exception as ex:
+            _LOGGER.warning(f"Unable to load the forecast store: {ex!r}")
+            return None
+
+        if data is None:
+            return await self._async_migrate()
+        if not all(k in data for k in ("last_update", "sites")):
+            return None
+
+        sites = {
+            site_id: {
+                "estimated_actuals": site.get("estimated_actuals"),
+                **{
+                    column: np.array(site[column], dtype=dtype)
+                    for column, dtype in _COLUMNS.items()
+                },
+            }
+            for site_id, site in data["sites"].items()
+        }
+
+        return datetime.fromisoformat(data["last_update"]), sites
+
+    async def async_save(self, last_update: datetime, sites: dict[str, dict]) -> None:
+        """Replace the stored forecast"""
+        await self._store.async_save(
+            {
+                "last_update": last_update.isoformat(),
+                "sites": {
+                    site_id: {
+                        "estimated_actuals": site["estimated_actuals"],
+                        **{column: site[column].tolist() for column in _COLUMNS},
+                    }
+                    for site_id, site in sites.items()
+                },
+            }
+        )
+
+    async def _async_migrate(self) -> tuple[datetime, dict[str, dict]] | None:
+        """Move a forecast restored to the legacy sensor into the store, once"""
+        try:
+            state = await self._async_legacy_state()
+            if state is None or not all(
+                k in state.attributes for k in ("forecast", "last_update")
+            ):
+                return None
+
+            last_update = datetime.fromisoformat(state.attributes["last_update"])
+            sites = {_LEGACY_SITE: self._legacy_site(state.attributes["forecast"])}
+        except Exception as ex:
+            _LOGGER.warning(f"Unable to migrate the legacy forecast: {ex!r}")
+            return None
+
+        _LOGGER.info(f"Migrating the forecast from {_LEGACY_ENTITY} to the store")
+        await self.async_save(last_update, sites)
+        return last_update, sites
+
+    async def _async_legacy_state(self):
+        """Last state of the legacy sensor, as restored at startup"""
+        if HA_MAJOR_VERSION > 2023 or (
+            HA_MAJOR_VERSION == 2023 and HA_MINOR_VERSION >= 2
+        ):
+            # 2023.2 loads restore state data once at startup
+            data = restore_state.async_get(self._hass)
+        else:
+            data = await restore_state.RestoreStateData.async_get_instance(self._hass)
+
+        stored = data.last_states.get(_LEGACY_ENTITY)
+        return stored.state if stored is not None else None
+
+    def _legacy_site(self, forecast: list[dict]) -> dict:
+        """Site timeline from the periods of every site, held as one list"""
+        df = pd.DataFrame.from_records(forecast, columns=["period_end", "pv_estimate"])
+        period_end = pd.to_datetime(df["period_end"], utc=True)
+        period_end = period_end.to_numpy(dtype="datetime64[ns]").astype("int64")
+        period_end, positions = np.unique(period_end // 10**9, return_inverse=True)
+        pv_estimate = np.bincount(
+            positions, weights=df["pv_estimate"], minlength=len(period_end)
+        )
+
+        # legacy forecasts have no percentiles, the next refresh replaces the site
+        return {
+            "estimated_actuals": None,
+            "period_start": period_end - 1800,
+            "period_end": period_end,
+            "pv_estimate": pv_estimate,
+            "pv_estimate10": pv_estimate,
+            "pv_estimate90": pv_estimate,
+        }
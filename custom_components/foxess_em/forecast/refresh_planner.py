@@ -0,0 +1,120 @@
+"""Forecast refresh planner"""
+
+from datetime import datetime, time, timedelta, timezone
+import logging
+
+import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+_CALLS = 1
+_ACTUALS_CALLS = 1  # estimated actuals, once a day
+_API_BUFFER = _CALLS * 2  # left for on demand refreshes
+_PERIOD = 1800
+
+
+class RefreshPlanner:
+    """Place forecast refreshes within the daily Solcast API budget
+
+    Refreshes are spread across the remaining generation periods of the UTC
+    day, weighted towards periods where successive forecasts disagreed most.
+    """
+
+    def __init__(self, start_hour: int, hours: int) -> None:
+        """Init with the window used whilst there is no forecast"""
+        self._start_hour = start_hour
+        self._hours = hours
+
+    def refreshes(
+        self,
+        now: datetime,
+        remaining: int,
+        sites: int,
+        actuals_due: int,
+        reserved: time | None,
+    ) -> int:
+        """Refreshes left today, keeping the reserved refresh and actuals"""
+        available = remaining - _API_BUFFER - _ACTUALS_CALLS * actuals_due
+        if reserved is not None and self._next(now, reserved) < self._day_end(now):
+            available -= _CALLS * sites
+
+        return max(int(available / (_CALLS * sites)), 0)
+
+    def plan(
+        self,
+        now: datetime,
+        refreshes: int,
+        periods: dict[str, np.ndarray],
+        changes: dict[str, np.ndarray],
+    ) -> list[datetime]:
+        """Refresh times until the end of the UTC day"""
+        if refreshes < 1:
+            return []
+
+        start = now.timestamp()
+        end = self._day_end(now).timestamp()
+
+        slots = np.array([], dtype=np.int64)
+        if len(periods) > 0:
+            period_start = periods["period_start"]
+            slots = period_start[
+                (period_start >= start)
+                & (period_start < end)
+                & (periods["pv_estimate"] > 0)
+            ]
+        if len(slots) == 0:
+            slots = self._default_slots(now, start, end)
+        if len(slots) == 0:
+            return []
+
+        # weight each period by how much it changed between forecasts
+        change = np.zeros(len(slots))
+        if len(changes) > 0 and len(changes["period_start"]) > 0:
+            index = np.searchsorted(changes["period_start"], slots)
+            index = np.minimum(index, len(changes["period_start"]) - 1)
+            found = changes["period_start"][index] == slots
+            change[found] = changes["change"][index[found]]
+        weights = change + (change.mean() if change.any() else 1)
+
+        # refreshes at even steps through the cumulative weight
+        cumulative = np.cumsum(weights)
+        targets = cumulative[-1] * np.arange(1, refreshes + 1) / (refreshes + 1)
+        index = np.searchsorted(cumulative, targets)
+        offset = (targets - (cumulative[index] - weights[index])) / weights[index]
+        minutes = np.unique((slots[index] + offset * _PERIOD) // 60)
+
+        return [
+            datetime.fromtimestamp(minute * 60, timezone.utc)
+            for minute in minutes.tolist()
+            if minute * 60 > start
+        ]
+
+    def _default_slots(self, now: datetime, start: float, end: float) -> np.ndarray:
+        """Periods within the default window of today and tomorrow"""
+        slots = []
+        for days in (0, 1):
+            window = (now + timedelta(days=days)).replace(
+                hour=self._start_hour, minute=0, second=0, microsecond=0
+            )
+            first = int(window.timestamp())
+            slots.append(np.arange(first, first + self._hours * 3600, _PERIOD))
+        slots = np.concatenate(slots)
+
+        return slots[(slots >= start) & (slots < end)]
+
+    def _next(self, now: datetime, refresh_time: time) -> datetime:
+        """Next occurrence of a local time"""
+        local = now.astimezone()
+        refresh = local.replace(
+            hour=refresh_time.hour,
+            minute=refresh_time.minute,
+            second=0,
+            microsecond=0,
+        )
+        if refresh <= local:
+            refresh += timedelta(days=1)
+        return refresh
+
+    def _day_end(self, now: datetime) -> datetime:
+        """Midnight UTC, when the API limit resets"""
+        day = now.astimezone(timezone.utc).date() + timedelta(days=1)
+        return datetime.combine(day, time(), tzinfo=timezone.utc)
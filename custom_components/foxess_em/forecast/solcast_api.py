@@ -1,16 +1,18 @@
 """Sample API Client."""
 
-from datetime import timedelta
 import logging
 from typing import Any
 
 import aiohttp
 import async_timeout
-import dateutil.parser
+import numpy as np
+import pandas as pd
 
 from ..util.exceptions import NoDataError
 
 _TIMEOUT = 20
+_PERIOD = 1800
+_ESTIMATES = ("pv_estimate", "pv_estimate10", "pv_estimate90")
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
@@ -51,8 +53,8 @@ class SolcastApiClient:
 
         return sites
 
-    async def async_get_data(self, site_id: str) -> dict:
-        """Get data from the API."""
+    async def async_get_estimated_actuals(self, site_id: str) -> dict[str, np.ndarray]:
+        """Get estimated actuals from the API, excluding the latest period"""
 
         _LOGGER.debug(f"Retrieving history data for site: {site_id}")
         history = await self._fetch_data(
@@ -60,36 +62,44 @@ class SolcastApiClient:
             solcast_url=f"{self._solcast_url}/rooftop_sites/{site_id}/estimated_actuals",
         )
 
+        if history is None:
+            raise NoDataError("Forecast data could not be processed")
+
+        estimates = self._estimates(history["estimated_actuals"])
+        return {column: values[1:] for column, values in estimates.items()}
+
+    async def async_get_forecasts(self, site_id: str) -> dict[str, np.ndarray]:
+        """Get forecasts from the API"""
+
         _LOGGER.debug(f"Retrieving forecast data for site: {site_id}")
         live = await self._fetch_data(
             api_key=self._solcast_api_key,
             solcast_url=f"{self._solcast_url}/rooftop_sites/{site_id}/forecasts",
         )
 
-        if (history is None) | (live is None):
+        if live is None:
             raise NoDataError("Forecast data could not be processed")
 
-        history_estimates = [
-            {
-                "period_start": dateutil.parser.isoparse(forecast["period_end"])
-                - timedelta(minutes=30),
-                "period_end": dateutil.parser.isoparse(forecast["period_end"]),
-                "pv_estimate": forecast["pv_estimate"],
-            }
-            for forecast in history["estimated_actuals"]
-        ]
-
-        live_estimates = [
-            {
-                "period_start": dateutil.parser.isoparse(forecast["period_end"])
-                - timedelta(minutes=30),
-                "period_end": dateutil.parser.isoparse(forecast["period_end"]),
-                "pv_estimate": forecast["pv_estimate"],
-            }
-            for forecast in live["forecasts"]
-        ]
-
-        return history_estimates[1:] + live_estimates
+        return self._estimates(live["forecasts"])
+
+    def _estimates(self, values: list[dict]) -> dict[str, np.ndarray]:
+        """Columns of API estimates, period start/end in epoch seconds
+
+        Estimated actuals have no percentiles, which fall back to the estimate.
+        """
+        df = pd.DataFrame.from_records(values, columns=["period_end", *_ESTIMATES])
+        for column in _ESTIMATES[1:]:
+            df[column] = df[column].fillna(df["pv_estimate"])
+
+        period_end = pd.to_datetime(df["period_end"], utc=True)
+        period_end = period_end.to_numpy(dtype="datetime64[ns]").astype("int64")
+        period_end //= 10**9
+
+        return {
+            "period_start": period_end - _PERIOD,
+            "period_end": period_end,
+            **{column: df[column].to_numpy(dtype=float) for column in _ESTIMATES},
+        }
 
     async def _fetch_data(
         self, api_key: str, solcast_url: str, hours=120
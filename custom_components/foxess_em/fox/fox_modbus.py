@@ -2,8 +2,8 @@ import asyncio
 import logging
 from typing import Any
 
-from pymodbus.client import ModbusSerialClient, ModbusTcpClient
-from pymodbus.exceptions import ModbusException, ModbusIOException
+from pymodbus.client import AsyncModbusSerialClient, AsyncModbusTcpClient
+from pymodbus.exceptions import ConnectionException, ModbusException, ModbusIOException
 
 from custom_components.foxess_em.const import (
     CONNECTION_TYPE,
@@ -11,6 +11,8 @@ from custom_components.foxess_em.const import (
     FOX_MODBUS_TCP,
 )
 
+from .modbus_session import ModbusSession
+
 _LOGGER = logging.getLogger(__name__)
 _WRITE_ATTEMPTS = 5
 _WRITE_ERROR_SLEEP = 5
@@ -24,29 +26,43 @@ class FoxModbus:
         self._hass = hass
         self._config = config
         self._write_errors = 0
-        self._lock = asyncio.Lock()
         self._config_type = config[CONNECTION_TYPE]
         self._class = {
-            FOX_MODBUS_SERIAL: ModbusSerialClient,
-            FOX_MODBUS_TCP: ModbusTcpClient,
+            FOX_MODBUS_SERIAL: AsyncModbusSerialClient,
+            FOX_MODBUS_TCP: AsyncModbusTcpClient,
         }
 
-        self._client = self._class[self._config_type](**config)
+        params = {k: v for k, v in config.items() if k != CONNECTION_TYPE}
+        # the session reconnects with its own backoff
+        self._client = self._class[self._config_type](**params, reconnect_delay=0)
+        self._session = ModbusSession(hass, self._client)
         self._hass.async_create_task(self.connect())
 
     async def connect(self):
         """Connect to device"""
-        _LOGGER.debug("Connecting to modbus - (%s)", self._config)
-        if not await self._async_pymodbus_call(self._client.connect):
-            _LOGGER.debug("Connect failed, pymodbus will retry")
+        try:
+            await self._session.async_connect()
+        except ConnectionException:
+            _LOGGER.debug("Connect failed, retrying in the background")
 
     async def close(self):
         """Close connection"""
-        _LOGGER.debug("Closing connection to modbus")
-        await self._async_pymodbus_call(self._client.close)
+        await self._session.async_close()
+
+    def set_health_check(self, address, slave):
+        """Register read whilst idle to keep the connection alive"""
+        self._session.set_health_check(
+            lambda: self._client.read_input_registers(address, 1, slave)
+        )
+
+    def healthy(self) -> bool:
+        """Whether the device answered the last request"""
+        return self._session.healthy()
 
-    async def read_registers(self, start_address, num_registers, slave):
-        """Read registers"""
+    async def read_registers(
+        self, start_address, num_registers, slave, background=False
+    ):
+        """Read registers, background reads wait out the reconnect backoff"""
         _LOGGER.debug(
             "Reading register: (%d, %d, %d)", start_address, num_registers, slave
         )
@@ -55,6 +71,7 @@ class FoxModbus:
             start_address,
             num_registers,
             slave,
+            background=background,
         )
 
         if response.isError():
@@ -66,6 +83,25 @@ class FoxModbus:
         ]
         return regs
 
+    async def read_holding_registers(self, start_address, num_registers, slave):
+        """Read holding registers, as written"""
+        _LOGGER.debug(
+            "Reading holding register: (%d, %d, %d)",
+            start_address,
+            num_registers,
+            slave,
+        )
+        response = await self._async_pymodbus_call(
+            self._client.read_holding_registers,
+            start_address,
+            num_registers,
+            slave,
+        )
+
+        if response.isError():
+            raise ModbusIOException(f"Error reading holding registers: {response}")
+        return response.registers
+
     async def write_registers(self, address, values, slave):
         """Write registers"""
         _LOGGER.debug("Writing register: (%d, %s, %d)", address, values, slave)
@@ -109,6 +145,11 @@ class FoxModbus:
             )
             return await self._handle_write_error(address, values, slave)
 
+    async def execute(self, request):
+        """Send a request from another Modbus client"""
+        _LOGGER.debug("Forwarding request: %s", request)
+        return await self._async_pymodbus_call(self._client.execute, request)
+
     async def _handle_write_error(self, address, values, slave):
         """Handle a write error"""
         if self._write_errors >= _WRITE_ATTEMPTS:
@@ -117,9 +158,8 @@ class FoxModbus:
             return False
         else:
             await asyncio.sleep(_WRITE_ERROR_SLEEP)
-            await self.write_registers(address, values, slave)
+            return await self.write_registers(address, values, slave)
 
-    async def _async_pymodbus_call(self, call, *args):
-        """Convert async to sync pymodbus call."""
-        async with self._lock:
-            return await self._hass.async_add_executor_job(call, *args)
+    async def _async_pymodbus_call(self, call, *args, background=False):
+        """Queue a pymodbus call on the shared connection"""
+        return await self._session.async_request(call, *args, background=background)
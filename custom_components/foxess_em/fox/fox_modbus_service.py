@@ -1,9 +1,14 @@
 """Fox controller"""
 
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime, time
 import logging
+from time import monotonic
 
 from homeassistant.core import HomeAssistant
+from pymodbus.exceptions import ModbusException
 
 from .fox_modbus import FoxModbus
 from .fox_service import FoxService
@@ -13,6 +18,9 @@ _DAY = 40002
 _CHARGE_CURRENT = 41007
 _MIN_SOC = 41011
 _P1_ENABLE = 41001
+_SHADOW_START = _P1_ENABLE
+_SHADOW_END = _MIN_SOC
+_SHADOW_MAX_AGE = 300
 
 
 class FoxModbuservice(FoxService):
@@ -34,6 +42,12 @@ class FoxModbuservice(FoxService):
         self._off_peak_start = off_peak_start
         self._off_peak_end = off_peak_end
         self._user_min_soc = user_min_soc
+        self._modbus.set_health_check(_DAY, self._slave)
+        self._shadow = {}
+        self._shadow_read = None
+        # each task batches its own writes
+        self._pending = ContextVar(f"foxess_em_batch_{id(self)}", default=None)
+        self._lock = asyncio.Lock()
 
     async def start_force_charge_now(self, *args) -> None:
         """Start force charge now"""
@@ -57,45 +71,133 @@ class FoxModbuservice(FoxService):
 
         if start > stop:
             _LOGGER.debug("Setting double charge window - %s / %s", start, stop)
-            await self._modbus.write_registers(
+            await self._write(
                 _P1_ENABLE,
                 [1, start_encoded, midnight_encoded, 1, next_day_encoded, stop_encoded],
-                self._slave,
             )
         else:
             _LOGGER.debug("Setting single charge window - %s / %s", start, stop)
-            await self._modbus.write_registers(
-                _P1_ENABLE, [1, start_encoded, stop_encoded, 0, 0, 0], self._slave
-            )
+            await self._write(_P1_ENABLE, [1, start_encoded, stop_encoded, 0, 0, 0])
 
     async def stop_force_charge(self, *args) -> None:  # pylint: disable=unused-argument
         """Start force charge"""
         _LOGGER.debug("Requesting stop force charge from Fox Modbus")
-        await self._modbus.write_registers(_P1_ENABLE, [0, 0, 0, 0, 0, 0], self._slave)
+        await self._write(_P1_ENABLE, [0, 0, 0, 0, 0, 0])
 
     async def set_min_soc(
         self, soc: int, *args
     ) -> None:  # pylint: disable=unused-argument
         """Start force charge"""
         _LOGGER.debug("Request set min SoC to Fox Modbus")
-        await self._modbus.write_registers(_MIN_SOC, [soc], self._slave)
+        await self._write(_MIN_SOC, [soc])
 
     async def set_charge_current(self, charge_current: float, *args) -> None:
         """Set charge current"""
         _LOGGER.debug(
             f"Requesting set charge current of {charge_current}A to Fox Modbus"
         )
-        await self._modbus.write_registers(
-            _CHARGE_CURRENT, [charge_current * 10], self._slave
-        )
+        await self._write(_CHARGE_CURRENT, [charge_current * 10])
 
     async def device_info(self) -> None:
         """Get device info"""
+        day = await self._modbus.read_registers(_DAY, 1, self._slave)
+        return day[0] == datetime.now().day
+
+    @asynccontextmanager
+    async def batch(self):
+        """Merge the register writes made within the block, writing on exit"""
+        if self._pending.get() is not None:
+            yield
+            return
+
+        pending = {}
+        token = self._pending.set(pending)
         try:
-            day = await self._modbus.read_registers(_DAY, 1, self._slave)
-            return day[0] == datetime.now().day
+            yield
         finally:
-            await self._modbus.close()
+            self._pending.reset(token)
+            await self._flush(pending)
+
+    async def _write(self, address, values) -> None:
+        """Write registers, or stage them whilst in a batch"""
+        registers = dict(zip(range(address, address + len(values)), map(int, values)))
+
+        pending = self._pending.get()
+        if pending is not None:
+            pending.update(registers)
+        else:
+            await self._flush(registers)
+
+    async def _flush(self, registers: dict[int, int]) -> None:
+        """Write the registers that differ from the inverter settings"""
+        if len(registers) == 0:
+            return
+
+        async with self._lock:
+            read = False
+            if (
+                self._shadow_read is None
+                or monotonic() - self._shadow_read >= _SHADOW_MAX_AGE
+            ):
+                await self._read_shadow()
+                read = True
+
+            changed = self._changed(registers)
+            if len(changed) < len(registers) and not read:
+                # the inverter app or cloud may have changed the settings since
+                await self._read_shadow()
+                changed = self._changed(registers)
+
+            if len(changed) == 0:
+                _LOGGER.debug("Skipping write, registers already set")
+                return
+
+            for address, values in self._runs(changed):
+                if await self._modbus.write_registers(address, values, self._slave):
+                    self._shadow.update(
+                        zip(range(address, address + len(values)), values)
+                    )
+                else:
+                    self.invalidate_shadow()
+
+    async def _read_shadow(self) -> None:
+        """Read the settings block"""
+        try:
+            values = await self._modbus.read_holding_registers(
+                _SHADOW_START, _SHADOW_END - _SHADOW_START + 1, self._slave
+            )
+        except ModbusException as ex:
+            _LOGGER.debug(f"Unable to read settings, writing all registers: {ex!r}")
+            self.invalidate_shadow()
+            return
+
+        self._shadow = dict(zip(range(_SHADOW_START, _SHADOW_END + 1), values))
+        self._shadow_read = monotonic()
+
+    def invalidate_shadow(self) -> None:
+        """Forget the settings, so they are read before the next write"""
+        self._shadow = {}
+        self._shadow_read = None
+
+    def _changed(self, registers: dict[int, int]) -> dict[int, int]:
+        """Registers that differ from the inverter settings, in address order"""
+        return {
+            address: value
+            for address, value in sorted(registers.items())
+            if self._shadow.get(address) != value
+        }
+
+    @staticmethod
+    def _runs(changed: dict[int, int]) -> list[tuple[int, list[int]]]:
+        """Contiguous changed registers, each written at once"""
+        runs = []
+        for address, value in changed.items():
+            if len(runs) > 0 and runs[-1][0] + len(runs[-1][1]) == address:
+                runs[-1][1].append(value)
+            else:
+                runs.append((address, [value]))
+
+        return runs
 
     def _encode_time(self, core_time):
         """Encode time to Fox time"""
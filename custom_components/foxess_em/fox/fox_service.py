@@ -1,5 +1,6 @@
 """Fox controller"""
 
+from contextlib import asynccontextmanager
 import logging
 
 _LOGGER = logging.getLogger(__name__)
@@ -33,3 +34,8 @@ class FoxService:
     async def device_info(self) -> None:
         """Get device info"""
         pass
+
+    @asynccontextmanager
+    async def batch(self):
+        """Group the settings changed within the block"""
+        yield
@@ -0,0 +1,171 @@
+"""Modbus proxy"""
+
+import asyncio
+import logging
+from time import monotonic
+from typing import Any, Callable
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import HomeAssistant
+from pymodbus.exceptions import ModbusException
+from pymodbus.factory import ServerDecoder
+from pymodbus.framer.socket_framer import ModbusSocketFramer
+from pymodbus.pdu import ModbusExceptions
+
+from ..common.unload_controller import UnloadController
+from .fox_modbus import FoxModbus
+
+_LOGGER = logging.getLogger(__name__)
+_CACHE_TTL = 1
+_READS = (1, 2, 3, 4)
+
+
+class ModbusProxy(UnloadController):
+    """Modbus TCP server sharing the inverter connection with other clients
+
+    Requests from every client are queued on the connection used by the
+    integration, so clients no longer compete for the inverter. Identical
+    reads within a second are sent once and answered to each client.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, modbus: FoxModbus, host: str, port: int
+    ) -> None:
+        """Init"""
+        self._hass = hass
+        self._modbus = modbus
+        self._host = host
+        self._port = port
+        self._server = None
+        self._clients = set()
+        self._cache = {}
+        self._reads = {}
+        # bumped by writes, so reads sent before a write are not cached
+        self._generation = 0
+        self._write_listeners = []
+
+        UnloadController.__init__(self)
+        self._stop_listener = hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, self._async_stop
+        )
+        self._unload_listeners.append(self._stop_listener)
+
+    def add_write_listener(self, listener: Callable[[], None]) -> None:
+        """Call a listener after a client writes to the inverter"""
+        self._write_listeners.append(listener)
+
+    async def async_start(self) -> None:
+        """Listen for Modbus TCP clients"""
+        try:
+            self._server = await asyncio.start_server(
+                self._async_client, host=self._host, port=self._port
+            )
+        except OSError as ex:
+            _LOGGER.error(
+                f"Unable to start Modbus proxy on {self._host}:{self._port}: {ex!r}"
+            )
+            return
+
+        _LOGGER.info(f"Modbus proxy listening on {self._host}:{self._port}")
+
+    async def async_stop(self) -> None:
+        """Disconnect clients and stop listening"""
+        self.unload()
+        if self._server is None:
+            return
+
+        self._server.close()
+        for writer in self._clients:
+            writer.close()
+        self._server = None
+
+    async def _async_stop(self, *args) -> None:  # pylint: disable=unused-argument
+        """Stop on shutdown, once fired the stop listener is already removed"""
+        self._unload_listeners.remove(self._stop_listener)
+        await self.async_stop()
+
+    async def _async_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Forward the requests of a client, answering each as it completes"""
+        _LOGGER.debug(
+            f"Modbus proxy client connected: {writer.get_extra_info('peername')}"
+        )
+        self._clients.add(writer)
+        framer = ModbusSocketFramer(ServerDecoder())
+        try:
+            while data := await reader.read(1024):
+                requests = []
+                try:
+                    framer.processIncomingPacket(
+                        data, requests.append, unit=[], single=True
+                    )
+                except ModbusException as ex:
+                    _LOGGER.debug(f"Modbus proxy discarding frame: {ex!r}")
+                    framer.resetFrame()
+                for request in requests:
+                    self._hass.async_create_task(
+                        self._async_answer(request, framer, writer)
+                    )
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _async_answer(
+        self, request: Any, framer: ModbusSocketFramer, writer: asyncio.StreamWriter
+    ) -> None:
+        """Send a request to the inverter and return the response to the client"""
+        transaction_id, unit_id = request.transaction_id, request.unit_id
+        try:
+            response = await self._async_forward(request)
+        except ModbusException as ex:
+            _LOGGER.debug(f"Modbus proxy request failed: {ex!r}")
+            response = request.doException(ModbusExceptions.GatewayNoResponse)
+
+        # responses may be shared between clients, so set the ids just in time
+        response.transaction_id = transaction_id
+        response.unit_id = unit_id
+        if not writer.is_closing():
+            writer.write(framer.buildPacket(response))
+
+    async def _async_forward(self, request: Any) -> Any:
+        """Response to a request, reads from the cache where possible"""
+        if request.function_code not in _READS:
+            self._generation += 1
+            self._cache.clear()
+            response = await self._modbus.execute(request)
+            if not response.isError():
+                for listener in self._write_listeners:
+                    listener()
+            return response
+
+        key = (request.unit_id, request.function_code, request.address, request.count)
+        cached = self._cache.get(key)
+        if cached is not None and monotonic() - cached[0] < _CACHE_TTL:
+            return cached[1]
+
+        # share the read already in progress, unless sent before a write
+        read = (self._generation, key)
+        if read not in self._reads:
+            self._reads[read] = self._hass.async_create_task(
+                self._async_read(read, request)
+            )
+        return await asyncio.shield(self._reads[read])
+
+    async def _async_read(self, read: tuple, request: Any) -> Any:
+        """Read from the inverter, caching the response"""
+        generation, key = read
+        try:
+            response = await self._modbus.execute(request)
+        finally:
+            self._reads.pop(read)
+
+        if not response.isError() and generation == self._generation:
+            now = monotonic()
+            self._cache = {
+                k: v for k, v in self._cache.items() if now - v[0] < _CACHE_TTL
+            }
+            self._cache[key] = (now, response)
+        return response
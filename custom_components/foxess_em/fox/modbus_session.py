@@ -0,0 +1,217 @@
+"""Modbus session"""
+
+import asyncio
+from datetime import timedelta
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from homeassistant.const import (
+    EVENT_HOMEASSISTANT_STOP,
+    MAJOR_VERSION as HA_MAJOR_VERSION,
+    MINOR_VERSION as HA_MINOR_VERSION,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.event import async_track_time_interval
+from pymodbus.exceptions import ConnectionException, ModbusException, ModbusIOException
+
+from ..common.unload_controller import UnloadController
+
+_LOGGER = logging.getLogger(__name__)
+_CONNECT_TIMEOUT = 10
+_BACKOFF_MIN = 1
+_BACKOFF_MAX = 300
+_KEEPALIVE = timedelta(seconds=60)
+
+
+class ModbusSession(UnloadController):
+    """Persistent connection shared by all requests to an async pymodbus client
+
+    Requests are queued and run one at a time on the event loop. The connection
+    stays open between requests, is checked whilst idle and is re-opened with
+    an increasing backoff when it drops.
+    """
+
+    def __init__(self, hass: HomeAssistant, client: Any) -> None:
+        """Init with an async pymodbus client, with its own reconnects disabled"""
+        self._hass = hass
+        self._client = client
+        self._queue = asyncio.Queue()
+        self._worker = None
+        self._current = None
+        self._health_check = None
+        self._healthy = False
+        self._backoff = _BACKOFF_MIN
+        self._retry_at = 0
+        self._last_response = 0
+        self._closed = False
+
+        UnloadController.__init__(self)
+        keepalive = async_track_time_interval(hass, self._async_keepalive, _KEEPALIVE)
+        self._unload_listeners.append(keepalive)
+        self._stop_listener = hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, self._async_stop
+        )
+        self._unload_listeners.append(self._stop_listener)
+
+    def set_health_check(self, check: Callable[[], Awaitable[Any]]) -> None:
+        """Request made whilst idle to confirm the device still responds"""
+        self._health_check = check
+
+    async def async_connect(self) -> None:
+        """Open the connection ahead of the first request"""
+        await self.async_request(self._async_noop)
+
+    async def async_request(
+        self, call: Callable[..., Awaitable[Any]], *args, background: bool = False
+    ) -> Any:
+        """Queue a request and wait for its response
+
+        Background requests wait out the reconnect backoff, other requests
+        reconnect straight away.
+        """
+        if self._closed:
+            raise ConnectionException("Modbus session closed")
+
+        if self._worker is None:
+            self._worker = self._create_task(self._async_work())
+
+        future = self._hass.loop.create_future()
+        self._queue.put_nowait((call, args, background, future))
+
+        return await future
+
+    async def async_close(self) -> None:
+        """Fail queued requests and close the connection"""
+        if self._closed:
+            return
+
+        self._closed = True
+        self.unload()
+
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+        # the request in flight is already off the queue
+        futures = [self._current] if self._current is not None else []
+        while not self._queue.empty():
+            *_, future = self._queue.get_nowait()
+            futures.append(future)
+        for future in futures:
+            if not future.done():
+                future.set_exception(ConnectionException("Modbus session closed"))
+
+        _LOGGER.debug("Closing connection to modbus")
+        await self._client.close()
+        self._healthy = False
+
+    def healthy(self) -> bool:
+        """Whether the last request was answered"""
+        return self._healthy
+
+    def queued(self) -> int:
+        """Requests waiting to be sent"""
+        return self._queue.qsize()
+
+    async def _async_stop(self, *args) -> None:  # pylint: disable=unused-argument
+        """Close on shutdown, once fired the stop listener is already removed"""
+        self._unload_listeners.remove(self._stop_listener)
+        await self.async_close()
+
+    async def _async_work(self) -> None:
+        """Run queued requests in order over the shared connection"""
+        while True:
+            call, args, background, future = await self._queue.get()
+            if future.done():
+                continue
+
+            self._current = future
+            try:
+                await self._async_ensure_connected(background)
+                response = await call(*args)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.set_exception(ConnectionException("Modbus session closed"))
+                raise
+            except (ModbusException, asyncio.TimeoutError, OSError) as ex:
+                if not isinstance(ex, ModbusException):
+                    ex = ModbusIOException(f"Request failed: {ex!r}")
+                self._set_healthy(False)
+                # start afresh, responses may still be in flight
+                await self._client.close()
+                if not future.done():
+                    future.set_exception(ex)
+            except Exception as ex:  # pylint: disable=broad-except
+                if not future.done():
+                    future.set_exception(ex)
+            else:
+                self._last_response = time.monotonic()
+                self._set_healthy(True)
+                if not future.done():
+                    future.set_result(response)
+            finally:
+                self._current = None
+
+    async def _async_ensure_connected(self, background: bool) -> None:
+        """Connect if the connection was lost"""
+        if self._client.connected:
+            return
+
+        now = time.monotonic()
+        if background and now < self._retry_at:
+            raise ConnectionException(
+                f"Modbus reconnect in {self._retry_at - now:.0f}s"
+            )
+
+        _LOGGER.debug("Connecting to modbus - (%s)", self._client)
+        try:
+            await asyncio.wait_for(self._client.connect(), _CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+
+        if not self._client.connected:
+            self._retry_at = now + self._backoff
+            _LOGGER.debug(f"Modbus connect failed, retrying in {self._backoff}s")
+            self._backoff = min(self._backoff * 2, _BACKOFF_MAX)
+            raise ConnectionException(f"Unable to connect to {self._client}")
+
+        self._backoff = _BACKOFF_MIN
+        self._retry_at = 0
+
+    async def _async_keepalive(self, *args) -> None:  # pylint: disable=unused-argument
+        """Reconnect or check the connection whilst idle"""
+        idle = time.monotonic() - self._last_response
+        if self._queue.qsize() > 0 or (
+            self._client.connected and idle < _KEEPALIVE.total_seconds()
+        ):
+            return
+
+        check = self._health_check or self._async_noop
+        try:
+            await self.async_request(check, background=True)
+        except ModbusException as ex:
+            _LOGGER.debug(f"Modbus keepalive failed: {ex!r}")
+
+    def _set_healthy(self, healthy: bool) -> None:
+        """Record the connection health, logging changes"""
+        if healthy != self._healthy:
+            if healthy:
+                _LOGGER.info("Modbus connection established")
+            else:
+                _LOGGER.warning("Modbus connection lost, reconnecting")
+        self._healthy = healthy
+
+    def _create_task(self, target: Awaitable[Any]) -> asyncio.Task:
+        """Create a long running task that does not delay startup"""
+        if HA_MAJOR_VERSION > 2023 or (
+            HA_MAJOR_VERSION == 2023 and HA_MINOR_VERSION >= 3
+        ):
+            # 2023.3 adds background tasks
+            return self._hass.async_create_background_task(target, "foxess_em modbus")
+        return self._hass.loop.create_task(target)
+
+    @staticmethod
+    async def _async_noop() -> None:
+        """Request that only needs a connection"""
+        return None
@@ -9,6 +9,7 @@ from .average import average_sensor
 from .battery import battery_sensor
 from .const import DOMAIN
 from .forecast import forecast_sensor
+from .telemetry import telemetry_sensor
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
@@ -23,7 +24,8 @@ async def async_setup_entry(
     history_sensors = average_sensor.sensors(controllers, entry)
     solcast_sensors = forecast_sensor.sensors(controllers, entry)
     battery_sensors = battery_sensor.sensors(controllers, entry)
+    telemetry_sensors = telemetry_sensor.sensors(controllers, entry)
 
-    entities = solcast_sensors + history_sensors + battery_sensors
+    entities = solcast_sensors + history_sensors + battery_sensors + telemetry_sensors
 
     async_add_devices(entities)
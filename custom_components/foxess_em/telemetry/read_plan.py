@@ -0,0 +1,61 @@
+"""Modbus read plan"""
+
+import logging
+
+from ..fox.fox_modbus import FoxModbus
+from .register_map import RegisterMap
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ReadPlan:
+    """Registers of a map grouped into as few block reads as possible"""
+
+    def __init__(self, register_map: RegisterMap) -> None:
+        """Init"""
+        self._registers = register_map.registers
+        self._blocks = self._plan(
+            sorted({a for r in self._registers for a in r.addresses}),
+            register_map.max_gap,
+            register_map.max_count,
+        )
+        _LOGGER.debug(f"Telemetry read plan: {self._blocks}")
+
+    def blocks(self) -> list[tuple[int, int]]:
+        """Start address and count of each read"""
+        return self._blocks
+
+    async def async_read(self, modbus: FoxModbus, slave: int) -> dict[str, float]:
+        """Read each block and decode the readings"""
+        values = {}
+        for start, count in self._blocks:
+            # polls never bypass the reconnect backoff of the session
+            registers = await modbus.read_registers(
+                start, count, slave, background=True
+            )
+            values.update(zip(range(start, start + count), registers))
+
+        return {
+            register.name: round(
+                sum(values[address] for address in register.addresses) * register.scale,
+                3,
+            )
+            for register in self._registers
+        }
+
+    @staticmethod
+    def _plan(
+        addresses: list[int], max_gap: int, max_count: int
+    ) -> list[tuple[int, int]]:
+        """Merge sorted addresses into blocks"""
+        blocks = []
+        for address in addresses:
+            if len(blocks) > 0:
+                start, count = blocks[-1]
+                end = start + count
+                if address - end <= max_gap and address - start < max_count:
+                    blocks[-1] = (start, address - start + 1)
+                    continue
+            blocks.append((address, 1))
+
+        return blocks
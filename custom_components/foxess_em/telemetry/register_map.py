@@ -0,0 +1,40 @@
+"""Inverter register maps"""
+
+from dataclasses import dataclass
+import logging
+
+from ..const import TELEMETRY_H1
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Register:
+    """Reading made from the sum of one or more input registers"""
+
+    name: str
+    addresses: tuple[int, ...]
+    scale: float = 1
+
+
+@dataclass(frozen=True)
+class RegisterMap:
+    """Readings of an inverter family"""
+
+    registers: tuple[Register, ...]
+    # largest run of unused registers read to avoid another request
+    max_gap: int = 16
+    max_count: int = 100
+
+
+REGISTER_MAPS: dict[str, RegisterMap] = {
+    # H1, AC1 and AIO-H1 over RS485, powers are read in W and published in kW
+    TELEMETRY_H1: RegisterMap(
+        registers=(
+            Register("pv_power", (11002, 11005), 0.001),
+            Register("grid_power", (11021,), 0.001),
+            Register("load_power", (11023,), 0.001),
+            Register("battery_soc", (11036,)),
+        ),
+    ),
+}
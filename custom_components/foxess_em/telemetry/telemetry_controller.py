@@ -0,0 +1,135 @@
+"""Telemetry controller"""
+
+from datetime import datetime, timedelta
+import logging
+from typing import Callable
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from pymodbus.exceptions import ModbusException
+
+from ..common.callback_controller import CallbackController
+from ..common.unload_controller import UnloadController
+from ..fox.fox_modbus import FoxModbus
+from .read_plan import ReadPlan
+from .register_map import REGISTER_MAPS
+
+_LOGGER = logging.getLogger(__name__)
+# readings older than this many polls are treated as unknown
+_STALE_POLLS = 3
+
+
+class TelemetryController(UnloadController, CallbackController):
+    """Inverter readings polled over Modbus
+
+    SoC changes are passed straight to SoC listeners rather than waiting on
+    another integration to update a sensor. Readings are unknown once the
+    inverter has not been read for a few polls.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        modbus: FoxModbus,
+        slave: int,
+        family: str,
+        interval: float,
+    ) -> None:
+        """Init"""
+        self._hass = hass
+        self._modbus = modbus
+        self._slave = slave
+        self._interval = timedelta(seconds=interval)
+        self._plan = ReadPlan(REGISTER_MAPS[family])
+        self._values = {}
+        self._last_update = None
+        self._stale = False
+        self._polling = False
+        self._soc_listeners = []
+
+        # Setup mixins
+        UnloadController.__init__(self)
+        CallbackController.__init__(self)
+
+        poll = async_track_time_interval(hass, self._async_poll, self._interval)
+        self._unload_listeners.append(poll)
+        hass.async_create_task(self._async_poll())
+
+    def ready(self) -> bool:
+        """Whether the inverter has been read"""
+        return len(self._values) > 0
+
+    def fresh(self) -> bool:
+        """Whether the last successful read is recent enough to act on"""
+        if self._last_update is None:
+            return False
+        age = datetime.now().astimezone() - self._last_update
+        return age < self._interval * _STALE_POLLS
+
+    def add_soc_listener(self, listener: Callable[[float], None]) -> None:
+        """Call a listener with each new battery SoC"""
+        self._soc_listeners.append(listener)
+
+    async def _async_poll(self, *args) -> None:  # pylint: disable=unused-argument
+        """Read the inverter, notifying listeners of changes"""
+        if self._polling:
+            # the previous poll is still queued behind other requests
+            return
+
+        self._polling = True
+        try:
+            values = await self._plan.async_read(self._modbus, self._slave)
+        except ModbusException as ex:
+            _LOGGER.debug(f"Unable to read telemetry: {ex!r}")
+            if self._last_update is not None and not self._stale and not self.fresh():
+                _LOGGER.warning("Telemetry is stale, using the battery SoC sensor")
+                self._stale = True
+                self._notify_listeners()
+            return
+        finally:
+            self._polling = False
+
+        previous, self._values = self._values, values
+        self._last_update = datetime.now().astimezone()
+        stale, self._stale = self._stale, False
+
+        if values["battery_soc"] != previous.get("battery_soc"):
+            self._notify_soc_listeners(values["battery_soc"])
+        if values != previous or stale:
+            self._notify_listeners()
+
+    @callback
+    def _notify_soc_listeners(self, soc: float) -> None:
+        """Pass a new SoC to the SoC listeners"""
+        for listener in self._soc_listeners:
+            listener(soc)
+
+    def battery_soc(self) -> float | None:
+        """Battery SoC (%)"""
+        return self._reading("battery_soc")
+
+    def pv_power(self) -> float | None:
+        """PV power (kW)"""
+        return self._reading("pv_power")
+
+    def load_power(self) -> float | None:
+        """House load (kW)"""
+        return self._reading("load_power")
+
+    def grid_power(self) -> float | None:
+        """Grid power, positive when exporting (kW)"""
+        return self._reading("grid_power")
+
+    def _reading(self, key: str) -> float | None:
+        """Value from the last read, unknown when stale"""
+        if not self.fresh():
+            return None
+        return self._values.get(key)
+
+    def telemetry_last_update(self) -> datetime | None:
+        """Time of the last successful read"""
+        return self._last_update
+
+    def telemetry_last_update_str(self) -> str:
+        """Time of the last successful read in ISO format"""
+        return self.telemetry_last_update().isoformat()
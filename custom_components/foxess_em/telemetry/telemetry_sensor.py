@@ -0,0 +1,61 @@
+"""Telemetry sensor"""
+
+import logging
+
+from homeassistant.components.sensor import SensorDeviceClass
+from homeassistant.const import PERCENTAGE, UnitOfPower
+
+from ..common.sensor import Sensor
+from ..common.sensor_desc import SensorDescription
+
+_LOGGER = logging.getLogger(__name__)
+
+SENSORS: dict[str, SensorDescription] = {
+    "battery_soc": SensorDescription(
+        key="battery_soc",
+        device_class=SensorDeviceClass.BATTERY,
+        native_unit_of_measurement=PERCENTAGE,
+        name="Inverter: Battery SoC",
+        icon="mdi:battery",
+        should_poll=False,
+        state_attributes={"Last Read:": "telemetry_last_update_str"},
+    ),
+    "pv_power": SensorDescription(
+        key="pv_power",
+        device_class=SensorDeviceClass.POWER,
+        native_unit_of_measurement=UnitOfPower.KILO_WATT,
+        name="Inverter: PV Power",
+        icon="mdi:solar-power",
+        should_poll=False,
+    ),
+    "load_power": SensorDescription(
+        key="load_power",
+        device_class=SensorDeviceClass.POWER,
+        native_unit_of_measurement=UnitOfPower.KILO_WATT,
+        name="Inverter: Load Power",
+        icon="mdi:home-lightning-bolt",
+        should_poll=False,
+    ),
+    "grid_power": SensorDescription(
+        key="grid_power",
+        device_class=SensorDeviceClass.POWER,
+        native_unit_of_measurement=UnitOfPower.KILO_WATT,
+        name="Inverter: Grid Power",
+        icon="mdi:transmission-tower",
+        should_poll=False,
+    ),
+}
+
+
+def sensors(controllers, entry) -> list:
+    """Setup sensor platform."""
+    entities = []
+
+    if "telemetry" not in controllers:
+        return entities
+
+    for sensor in SENSORS:
+        sen = Sensor(controllers["telemetry"], SENSORS[sensor], entry)
+        entities.append(sen)
+
+    return entities
@@ -2,6 +2,8 @@
 
 from datetime import date, datetime, time, timedelta
 
+import numpy as np
+
 
 class PeakPeriodUtils:
     """Peak Period Utils"""
@@ -15,6 +17,43 @@ class PeakPeriodUtils:
         """In peak period"""
         return self._in_between(period, self._eco_start_time, self._eco_end_time)
 
+    def in_peak_seconds(self, seconds: np.ndarray) -> np.ndarray:
+        """In peak period for an array of seconds since midnight"""
+        start = self._seconds(self._eco_start_time)
+        end = self._seconds(self._eco_end_time)
+
+        if start <= end:
+            return (seconds > start) & (seconds <= end)
+        else:  # over midnight e.g., 23:30-04:15
+            return (seconds > start) | (seconds <= end)
+
+    def local_seconds(self, epoch: np.ndarray) -> np.ndarray:
+        """Seconds since local midnight for an array of UTC epoch seconds"""
+        return (epoch + self._local_offsets(epoch)) % 86400
+
+    @staticmethod
+    def local_weekend(epoch: np.ndarray) -> np.ndarray:
+        """Local weekend days for an array of UTC epoch seconds"""
+        days = (epoch + PeakPeriodUtils._local_offsets(epoch)) // 86400
+        # 1970-01-01 was a Thursday
+        return (days + 3) % 7 >= 5
+
+    @staticmethod
+    def _local_offsets(epoch: np.ndarray) -> np.ndarray:
+        """Local UTC offsets in seconds for an array of UTC epoch seconds"""
+        # UTC offsets only change on DST boundaries, so look them up per quarter hour
+        blocks, inverse = np.unique(epoch // 900, return_inverse=True)
+        offsets = [
+            datetime.fromtimestamp(block * 900).astimezone().utcoffset()
+            for block in blocks
+        ]
+
+        return np.array([offset.total_seconds() for offset in offsets])[inverse]
+
+    def eco_start_seconds(self) -> float:
+        """Eco start time in seconds since midnight"""
+        return self._seconds(self._eco_start_time)
+
     def next_eco_start(self) -> datetime:
         """Next eco start time"""
         now = datetime.now().astimezone()
@@ -62,6 +101,15 @@ class PeakPeriodUtils:
         else:  # over midnight e.g., 23:30-04:15
             return now > start or now <= end
 
+    def _seconds(self, period: time) -> float:
+        """Seconds since midnight"""
+        return (
+            (period.hour * 3600)
+            + (period.minute * 60)
+            + period.second
+            + (period.microsecond / 1e6)
+        )
+
     def time_window(self) -> timedelta:
         """Calculate off-peak time window"""
         today = date.today()
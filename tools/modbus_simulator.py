@@ -0,0 +1,469 @@
+"""Local Modbus simulator of a Fox H1 inverter
+
+Serves the registers used by the integration over Modbus TCP or a pty serial
+port, optionally injecting latency, exception responses and dropped requests.
+The battery charges and discharges from the force charge windows, charge
+current and min SoC written to it, against simulated solar and house load,
+on a clock that can run faster than real time.
+
+    python tools/modbus_simulator.py serve --port 5020 --latency 0.05
+    python tools/modbus_simulator.py serve --serial --speed 60
+    python tools/modbus_simulator.py bench --commands 200 --error-rate 0.02
+    python tools/modbus_simulator.py cycle --speed 1200 --soc 20 --target 80
+
+Point the Modbus TCP host and port (or the serial port printed on start) of
+the integration at it to use it from Home Assistant, slave id 247.
+"""
+
+import argparse
+import asyncio
+from collections import Counter
+from datetime import datetime, time as clock_time, timedelta
+import json
+import logging
+import math
+import os
+import random
+import time
+import tty
+
+from pymodbus.client import AsyncModbusTcpClient
+from pymodbus.factory import ServerDecoder
+from pymodbus.framer.rtu_framer import ModbusRtuFramer
+from pymodbus.framer.socket_framer import ModbusSocketFramer
+from pymodbus.pdu import ModbusExceptions
+
+_LOGGER = logging.getLogger(__name__)
+_CLOCK = 40000  # year, month, day, hour, minute, second
+_SETTINGS = 41001  # 2 force charge windows, charge current, ..., min SoC
+_P1_ENABLE = 41001
+_P2_ENABLE = 41004
+_CHARGE_CURRENT = 41007
+_MIN_SOC = 41011
+_PV1_POWER = 11002
+_PV2_POWER = 11005
+_GRID_POWER = 11021
+_LOAD_POWER = 11023
+_BATTERY_SOC = 11036
+_INPUT_RANGES = (range(_CLOCK, _CLOCK + 6), range(11000, 11044))
+_HOLDING_RANGES = (range(_CLOCK, _CLOCK + 6), range(_SETTINGS, _MIN_SOC + 1))
+_STEP = timedelta(minutes=1)
+
+
+class Inverter:
+    """Fox H1 registers backed by a simulated battery, solar and house load"""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        """Init at the simulated start time"""
+        self._speed = args.speed
+        self._capacity = args.capacity
+        self._volts = args.volts
+        self._max_power = args.max_power
+        self._pv_peak = args.pv_peak
+        self._energy = args.soc / 100 * args.capacity
+        self._started = time.monotonic()
+        self._start = args.start
+        self._last = args.start
+        self._pv = 0
+        self._load = 0
+        self._grid = 0
+        self._registers = {address: 0 for address in range(11000, 11044)}
+        self._registers.update(
+            dict(zip(range(_SETTINGS, _MIN_SOC + 1), [0] * 6 + [500, 500, 10, 10, 10]))
+        )
+        self.writes = Counter()
+        self._refresh_registers()
+
+    def now(self) -> datetime:
+        """Simulated time"""
+        return self._start + timedelta(
+            seconds=(time.monotonic() - self._started) * self._speed
+        )
+
+    def soc(self) -> float:
+        """Battery SoC (%)"""
+        return self._energy / self._capacity * 100
+
+    def force_charge(self, when: datetime) -> bool:
+        """Whether a force charge window is enabled at a time"""
+        encoded = when.hour * 256 + when.minute
+        for enable in (_P1_ENABLE, _P2_ENABLE):
+            start, end = self._registers[enable + 1], self._registers[enable + 2]
+            if self._registers[enable] == 1 and start <= encoded < end:
+                return True
+        return False
+
+    def state(self) -> dict:
+        """Current simulated readings"""
+        return {
+            "time": self._last.isoformat(timespec="minutes"),
+            "soc": round(self.soc(), 1),
+            "pv": round(self._pv, 2),
+            "load": round(self._load, 2),
+            "grid": round(self._grid, 2),
+            "force_charge": self.force_charge(self._last),
+        }
+
+    def validate(self, fx: int, address: int, count: int = 1) -> bool:
+        """Whether a block of registers exists for a function code"""
+        ranges = _INPUT_RANGES if fx == 4 else _HOLDING_RANGES
+        return any(
+            address in block and address + count - 1 in block for block in ranges
+        )
+
+    def getValues(self, fx: int, address: int, count: int = 1) -> list[int]:
+        """Read registers at the simulated time"""
+        self._advance()
+        return [self._registers.get(a, 0) for a in range(address, address + count)]
+
+    def setValues(self, fx: int, address: int, values: list[int]) -> None:
+        """Write registers, settling the simulation up to now first"""
+        self._advance()
+        for offset, value in enumerate(values):
+            self._registers[address + offset] = value
+            self.writes[address + offset] += 1
+
+    def _advance(self) -> None:
+        """Run the battery model in one minute steps up to now"""
+        now = self.now()
+        while self._last + _STEP <= now:
+            self._simulate(self._last, _STEP.total_seconds() / 3600)
+            self._last += _STEP
+        self._refresh_registers()
+
+    def _simulate(self, when: datetime, hours: float) -> None:
+        """Battery, solar and grid power for one step"""
+        hour = when.hour + when.minute / 60
+        self._pv = self._pv_peak * max(0, math.sin(math.pi * (hour - 6) / 12))
+        self._load = 0.4 + (1.2 if 17 <= hour < 21 else 0)
+
+        min_energy = self._registers[_MIN_SOC] / 100 * self._capacity
+        room = (self._capacity - self._energy) / hours
+        if self.force_charge(when):
+            current = self._registers[_CHARGE_CURRENT] / 10
+            battery = min(current * self._volts / 1000, self._max_power, room)
+        elif self._pv >= self._load:
+            battery = min(self._pv - self._load, self._max_power, room)
+        else:
+            available = max(self._energy - min_energy, 0) / hours
+            battery = -min(self._load - self._pv, self._max_power, available)
+
+        self._energy += battery * hours
+        self._grid = self._pv - self._load - battery
+
+    def _refresh_registers(self) -> None:
+        """Clock and telemetry registers from the simulation"""
+        now = self._last
+        clock = [now.year, now.month, now.day, now.hour, now.minute, now.second]
+        self._registers.update(zip(range(_CLOCK, _CLOCK + 6), clock))
+        self._registers[_PV1_POWER] = self._unsigned(self._pv * 500)
+        self._registers[_PV2_POWER] = self._unsigned(self._pv * 500)
+        self._registers[_GRID_POWER] = self._unsigned(self._grid * 1000)
+        self._registers[_LOAD_POWER] = self._unsigned(self._load * 1000)
+        self._registers[_BATTERY_SOC] = round(self.soc())
+
+    @staticmethod
+    def _unsigned(value: float) -> int:
+        """Signed reading as a register value"""
+        return round(value) & 0xFFFF
+
+
+class Simulator:
+    """Modbus server for the inverter with injected latency and errors
+
+    Requests on a connection are answered one at a time, as by the RS485
+    bridges the integration is used with.
+    """
+
+    def __init__(self, inverter: Inverter, args: argparse.Namespace) -> None:
+        """Init"""
+        self._inverter = inverter
+        self._slave = args.slave
+        self._latency = args.latency
+        self._jitter = args.jitter
+        self._error_rate = args.error_rate
+        self._drop_rate = args.drop_rate
+        self._requests = Counter()
+        self._results = Counter()
+        self._connections = 0
+        self._pty = None
+
+    async def serve_tcp(self, host: str, port: int) -> asyncio.AbstractServer:
+        """Listen for Modbus TCP connections"""
+        return await asyncio.start_server(self._tcp_connection, host, port)
+
+    def serve_pty(self) -> str:
+        """Open a pty and serve Modbus RTU on it, returning the port to use"""
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        # keep the slave end open so the pty survives clients reconnecting
+        self._pty = (master, slave)
+
+        framer = ModbusRtuFramer(ServerDecoder())
+        queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        loop.add_reader(master, lambda: queue.put_nowait(os.read(master, 1024)))
+
+        async def serve() -> None:
+            while True:
+                data = await queue.get()
+                for request in self._decode(framer, data):
+                    await self._respond(request, framer, lambda p: os.write(master, p))
+
+        loop.create_task(serve())
+        return os.ttyname(slave)
+
+    def stats(self) -> dict:
+        """Requests by function code, results and writes by register"""
+        return {
+            "requests": {str(fc): n for fc, n in self._requests.items()},
+            "results": dict(self._results),
+            "writes": {str(a): n for a, n in sorted(self._inverter.writes.items())},
+            "connections": self._connections,
+            "state": self._inverter.state(),
+        }
+
+    async def _tcp_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer the requests of one TCP client"""
+        self._connections += 1
+        framer = ModbusSocketFramer(ServerDecoder())
+        try:
+            while data := await reader.read(1024):
+                for request in self._decode(framer, data):
+                    await self._respond(request, framer, writer.write)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _decode(self, framer, data: bytes) -> list:
+        """Requests framed from received bytes, for this slave only"""
+        requests = []
+        try:
+            framer.processIncomingPacket(data, requests.append, unit=[self._slave])
+        except Exception as ex:
+            _LOGGER.warning(f"Discarding malformed frame: {ex!r}")
+            framer.resetFrame()
+        return requests
+
+    async def _respond(self, request, framer, write) -> None:
+        """Answer a request after the injected latency, unless dropped"""
+        self._requests[request.function_code] += 1
+
+        delay = self._latency + random.uniform(0, self._jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if random.random() < self._drop_rate:
+            self._results["dropped"] += 1
+            return
+        if random.random() < self._error_rate:
+            response = request.doException(ModbusExceptions.SlaveBusy)
+            self._results["busy"] += 1
+        else:
+            response = request.execute(self._inverter)
+            self._results["error" if response.isError() else "ok"] += 1
+
+        response.transaction_id = request.transaction_id
+        response.unit_id = request.unit_id
+        write(framer.buildPacket(response))
+
+
+async def _start(args: argparse.Namespace) -> tuple[Simulator, asyncio.AbstractServer]:
+    """Simulator listening on the configured host and port"""
+    simulator = Simulator(Inverter(args), args)
+    server = await simulator.serve_tcp(args.host, args.port)
+    return simulator, server
+
+
+async def _connect(args: argparse.Namespace) -> AsyncModbusTcpClient:
+    """Client of the simulator"""
+    client = AsyncModbusTcpClient(args.host, args.port, timeout=1, retries=0)
+    await client.connect()
+    return client
+
+
+def _encode(value: clock_time) -> int:
+    """Fox encoded time"""
+    return value.hour * 256 + value.minute
+
+
+async def serve(args: argparse.Namespace) -> None:
+    """Serve until interrupted, logging the simulation every 30 minutes"""
+    simulator = Simulator(Inverter(args), args)
+    if args.serial:
+        _LOGGER.info(f"Serial port: {simulator.serve_pty()}")
+    else:
+        await simulator.serve_tcp(args.host, args.port)
+        _LOGGER.info(f"Listening on {args.host}:{args.port}")
+
+    try:
+        while True:
+            await asyncio.sleep(1800 / args.speed)
+            _LOGGER.info(json.dumps(simulator.stats()))
+    finally:
+        print(json.dumps(simulator.stats()))
+
+
+async def bench(args: argparse.Namespace) -> None:
+    """Time the commands the integration sends"""
+    simulator, server = await _start(args)
+    client = await _connect(args)
+    commands = {
+        "force_charge": lambda: client.write_registers(
+            _P1_ENABLE,
+            [1, _encode(clock_time(0, 30)), _encode(clock_time(4, 30))] + [0, 0, 0],
+            args.slave,
+        ),
+        "charge_current": lambda: client.write_register(
+            _CHARGE_CURRENT, 180, args.slave
+        ),
+        "min_soc": lambda: client.write_register(_MIN_SOC, 10, args.slave),
+        "settings_read": lambda: client.read_holding_registers(
+            _SETTINGS, _MIN_SOC - _SETTINGS + 1, args.slave
+        ),
+        "telemetry_read": lambda: client.read_input_registers(
+            _PV1_POWER, _BATTERY_SOC - _PV1_POWER + 1, args.slave
+        ),
+    }
+
+    timings = {name: [] for name in commands}
+    failures = Counter()
+    started = time.perf_counter()
+    try:
+        for index in range(args.commands):
+            name = list(commands)[index % len(commands)]
+            start = time.perf_counter()
+            try:
+                response = await commands[name]()
+                if response.isError():
+                    failures[name] += 1
+                    continue
+            except Exception as ex:
+                _LOGGER.debug(f"{name} failed: {ex!r}")
+                failures[name] += 1
+                # a dropped request leaves the connection unusable
+                await client.close()
+                client = await _connect(args)
+                continue
+            timings[name].append(time.perf_counter() - start)
+    finally:
+        elapsed = time.perf_counter() - started
+        await client.close()
+        server.close()
+
+    print(f"{args.commands} commands in {elapsed:.2f}s")
+    for name, values in timings.items():
+        values.sort()
+        if len(values) == 0:
+            print(f"{name}: all {failures[name]} failed")
+            continue
+        print(
+            f"{name}: p50 {values[len(values) // 2] * 1000:.1f}ms "
+            f"p95 {values[int(len(values) * 0.95)] * 1000:.1f}ms "
+            f"max {values[-1] * 1000:.1f}ms failed {failures[name]}"
+        )
+    print(json.dumps(simulator.stats()))
+
+
+async def cycle(args: argparse.Namespace) -> None:
+    """Replay an eco period charge cycle against the accelerated clock
+
+    Sends the commands the charge service makes at eco start setup, eco start,
+    on SoC changes and at eco end.
+    """
+    day = datetime.now().date()
+    eco_start = datetime.combine(day, args.eco_start)
+    eco_end = datetime.combine(day, args.eco_end)
+    if eco_end <= eco_start:
+        eco_end += timedelta(days=1)
+    args.start = eco_start - timedelta(minutes=10)
+
+    simulator, server = await _start(args)
+    inverter = simulator._inverter
+    client = await _connect(args)
+    window = [1, _encode(args.eco_start), _encode(args.eco_end), 0, 0, 0]
+    events = []
+
+    async def write(name: str, address: int, values: list[int]) -> None:
+        response = await client.write_registers(address, values, args.slave)
+        events.append({**inverter.state(), "event": name, "ok": not response.isError()})
+
+    async def wait_until(when: datetime) -> None:
+        await asyncio.sleep(
+            max((when - inverter.now()).total_seconds(), 0) / args.speed
+        )
+
+    charging = True
+    try:
+        await wait_until(eco_start - timedelta(minutes=5))
+        await write("eco_start_setup", _P1_ENABLE, window + [args.amps * 10])
+        await write("reset_min_soc", _MIN_SOC, [args.min_soc])
+        await wait_until(eco_start)
+        await write("hold_min_soc", _MIN_SOC, [args.target])
+
+        while inverter.now() < eco_end:
+            await asyncio.sleep(60 / args.speed)
+            soc = await client.read_input_registers(_BATTERY_SOC, 1, args.slave)
+            soc = soc.registers[0]
+            if charging and soc >= args.target:
+                charging = False
+                await write("stop_force_charge", _P1_ENABLE, [0] * 6)
+            elif not charging and soc < args.target - 2:
+                charging = True
+                await write("start_force_charge", _P1_ENABLE, window)
+
+        await write("eco_end", _P1_ENABLE, window + [args.amps * 10])
+        await write("release_min_soc", _MIN_SOC, [args.min_soc])
+    finally:
+        await client.close()
+        server.close()
+
+    for event in events:
+        print(json.dumps(event))
+    print(json.dumps(simulator.stats()))
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=["serve", "bench", "cycle"])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--serial", action="store_true", help="serve on a pty")
+    parser.add_argument("--slave", type=int, default=247)
+    parser.add_argument("--latency", type=float, default=0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="busy ratio")
+    parser.add_argument("--drop-rate", type=float, default=0, help="no reply ratio")
+    parser.add_argument("--speed", type=float, default=1, help="clock multiplier")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="clock start")
+    parser.add_argument("--soc", type=float, default=20, help="initial SoC %%")
+    parser.add_argument("--capacity", type=float, default=10.4, help="kWh")
+    parser.add_argument("--volts", type=float, default=208)
+    parser.add_argument("--max-power", type=float, default=3.6, help="kW")
+    parser.add_argument("--pv-peak", type=float, default=3.5, help="kW")
+    parser.add_argument("--commands", type=int, default=100, help="bench commands")
+    parser.add_argument("--eco-start", type=clock_time.fromisoformat, default="00:30")
+    parser.add_argument("--eco-end", type=clock_time.fromisoformat, default="04:30")
+    parser.add_argument("--target", type=int, default=80, help="cycle target SoC")
+    parser.add_argument("--min-soc", type=int, default=10, help="cycle min SoC")
+    parser.add_argument("--amps", type=int, default=18, help="cycle charge current")
+    args = parser.parse_args()
+
+    if args.start is None:
+        args.start = datetime.now()
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("pymodbus").setLevel(logging.CRITICAL)
+
+    try:
+        asyncio.run({"serve": serve, "bench": bench, "cycle": cycle}[args.mode](args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""Local stand-in for the Solcast API
+
+Serves rooftop sites, forecasts and estimated actuals from recorded fixtures,
+optionally injecting latency, rate limiting and errors. Fixtures are recorded
+by proxying the real API, without them a synthetic clear sky day is served.
+
+    python tools/solcast_standin.py record --fixtures fixtures
+    python tools/solcast_standin.py serve --fixtures fixtures --latency 0.5
+    python tools/solcast_standin.py bench --sites 4 --refreshes 20
+
+Set SOLCAST_URL in const.py to http://localhost:8080 to use it from Home
+Assistant, api keys are passed through when recording and ignored otherwise.
+"""
+
+import argparse
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+import math
+from pathlib import Path
+import random
+import sys
+import time
+
+from aiohttp import ClientSession, web
+
+_LOGGER = logging.getLogger(__name__)
+_SOLCAST_URL = "https://api.solcast.com.au"
+_PERIOD = timedelta(minutes=30)
+_ESTIMATES = ("forecasts", "estimated_actuals")
+
+
+class Fixtures:
+    """Recorded responses, laid out as the API paths under a directory"""
+
+    def __init__(self, path: Path | None, sites: int, shift: bool) -> None:
+        """Init with the number of sites to serve"""
+        self._path = path
+        self._shift = shift
+        self._sites = self._load_sites(sites)
+
+    def sites(self) -> dict:
+        """Rooftop sites response"""
+        return {"sites": [site for site, _ in self._sites.values()]}
+
+    def estimates(self, site_id: str, kind: str, hours: int) -> dict | None:
+        """Forecasts or estimated actuals, moved to the current period"""
+        if site_id not in self._sites:
+            return None
+        _, source = self._sites[site_id]
+
+        forecasts = self._read(source, "forecasts")["forecasts"]
+        values = self._read(source, kind)[kind]
+
+        if self._shift and len(forecasts) > 0:
+            # recorded forecasts start at the next period end
+            first = min(self._parse(value["period_end"]) for value in forecasts)
+            offset = self._period_end(datetime.now(timezone.utc)) - first
+            values = [
+                {
+                    **value,
+                    "period_end": self._format(
+                        self._parse(value["period_end"]) + offset
+                    ),
+                }
+                for value in values
+            ]
+
+        return {kind: values[: hours * 2]}
+
+    def _load_sites(self, count: int) -> dict[str, tuple[dict, str]]:
+        """Site and the site its fixtures come from, cloned up to a count"""
+        recorded = []
+        if self._path is not None:
+            with open(self._path / "rooftop_sites.json") as file:
+                recorded = json.load(file)["sites"]
+        if len(recorded) == 0:
+            recorded = [{"resource_id": "standin", "name": "Stand-in", "capacity": 5}]
+
+        count = max(count, len(recorded))
+        sites = {}
+        for i in range(count):
+            site = recorded[i % len(recorded)]
+            source = site["resource_id"]
+            site_id = source if i < len(recorded) else f"{source}-{i}"
+            sites[site_id] = ({**site, "resource_id": site_id}, source)
+
+        return sites
+
+    def _read(self, source: str, kind: str) -> dict:
+        """Recorded response, or a synthetic day without fixtures"""
+        path = None if self._path is None else self._path / source / f"{kind}.json"
+        if path is None or not path.exists():
+            return {kind: self._synthetic(kind)}
+
+        with open(path) as file:
+            return json.load(file)
+
+    def _synthetic(self, kind: str) -> list[dict]:
+        """Clear sky estimates, 7 days either side of now"""
+        now = self._period_end(datetime.now(timezone.utc))
+        if kind == "forecasts":
+            ends = [now + _PERIOD * i for i in range(336)]
+        else:
+            ends = [now - _PERIOD * i for i in range(336)]
+
+        values = []
+        for end in ends:
+            hour = (end - _PERIOD / 2).hour + (end - _PERIOD / 2).minute / 60
+            estimate = round(max(math.sin((hour - 6) / 12 * math.pi), 0) * 3.5, 4)
+            values.append(
+                {
+                    "pv_estimate": estimate,
+                    "pv_estimate10": round(estimate * 0.6, 4),
+                    "pv_estimate90": round(estimate * 1.1, 4),
+                    "period_end": self._format(end),
+                    "period": "PT30M",
+                }
+            )
+        return values
+
+    @staticmethod
+    def _period_end(date: datetime) -> datetime:
+        """End of the half hour containing a date"""
+        start = date.replace(
+            minute=date.minute - date.minute % 30, second=0, microsecond=0
+        )
+        return start + _PERIOD
+
+    @staticmethod
+    def _parse(value: str) -> datetime:
+        """Solcast timestamps have 7 fractional digits"""
+        return datetime.fromisoformat(value.replace("Z", "+00:00")[:19]).replace(
+            tzinfo=timezone.utc
+        )
+
+    @staticmethod
+    def _format(value: datetime) -> str:
+        """Timestamp in the Solcast format"""
+        return value.strftime("%Y-%m-%dT%H:%M:%S.0000000Z")
+
+
+class StandIn:
+    """Solcast API routes with injected latency, rate limits and errors"""
+
+    def __init__(self, fixtures: Fixtures, args: argparse.Namespace) -> None:
+        """Init"""
+        self._fixtures = fixtures
+        self._latency = args.latency
+        self._jitter = args.jitter
+        self._limit = args.limit
+        self._rate_limit = args.rate_limit
+        self._error_rate = args.error_rate
+        self._calls = Counter()
+        self._statuses = Counter()
+        self._active = 0
+        self._peak = 0
+
+    def app(self) -> web.Application:
+        """Web application"""
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/rooftop_sites", self._sites)
+        app.router.add_get("/rooftop_sites/{site_id}/{kind}", self._estimates)
+        app.router.add_get("/json/reply/GetUserDailyLimit", self._daily_limit)
+        app.router.add_get("/standin/stats", self._stats)
+        return app
+
+    def stats(self) -> dict:
+        """Calls, statuses and peak concurrency"""
+        return {
+            "calls": dict(self._calls),
+            "statuses": dict(self._statuses),
+            "peak_concurrency": self._peak,
+        }
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.Response:
+        """Track concurrency and inject latency and errors"""
+        if request.path == "/standin/stats":
+            return await handler(request)
+
+        self._active += 1
+        self._peak = max(self._peak, self._active)
+        try:
+            delay = self._latency + random.uniform(0, self._jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if random.random() < self._rate_limit:
+                response = web.Response(status=429)
+            elif random.random() < self._error_rate:
+                response = web.Response(status=500)
+            else:
+                response = await handler(request)
+        finally:
+            self._active -= 1
+
+        self._statuses[response.status] += 1
+        return response
+
+    async def _sites(self, request: web.Request) -> web.Response:
+        """Rooftop sites"""
+        return web.json_response(self._fixtures.sites())
+
+    async def _estimates(self, request: web.Request) -> web.Response:
+        """Forecasts or estimated actuals of a site"""
+        kind = request.match_info["kind"]
+        if kind not in _ESTIMATES:
+            return web.Response(status=404)
+
+        # Solcast counts estimate calls against the daily limit
+        key = request.query.get("api_key", "")
+        if self._limit is not None and self._calls[key] >= self._limit:
+            return web.Response(status=429)
+
+        hours = int(request.query.get("hours", 168))
+        body = self._fixtures.estimates(request.match_info["site_id"], kind, hours)
+        if body is None:
+            return web.Response(status=404)
+
+        self._calls[key] += 1
+        return web.json_response(body)
+
+    async def _daily_limit(self, request: web.Request) -> web.Response:
+        """Daily limit and usage of the api key"""
+        key = request.query.get("api_key", "")
+        return web.json_response(
+            {"daily_limit": self._limit or 0, "daily_limit_consumed": self._calls[key]}
+        )
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        """Stand-in statistics"""
+        return web.json_response(self.stats())
+
+
+class Recorder:
+    """Proxies the real API, saving successful responses as fixtures"""
+
+    def __init__(self, path: Path, upstream: str) -> None:
+        """Init"""
+        self._path = path
+        self._upstream = upstream
+        self._session = None
+
+    def app(self) -> web.Application:
+        """Web application"""
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self._proxy)
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
+        return app
+
+    async def _start(self, app: web.Application) -> None:
+        """Open the upstream session"""
+        self._session = ClientSession()
+
+    async def _stop(self, app: web.Application) -> None:
+        """Close the upstream session"""
+        await self._session.close()
+
+    async def _proxy(self, request: web.Request) -> web.Response:
+        """Forward a request and record the response"""
+        async with self._session.get(
+            f"{self._upstream}{request.path}", params=request.query
+        ) as response:
+            body = await response.read()
+            status = response.status
+
+        fixture = self._fixture(request.path)
+        if status == 200 and fixture is not None:
+            fixture.parent.mkdir(parents=True, exist_ok=True)
+            fixture.write_bytes(body)
+            _LOGGER.info(f"Recorded {fixture}")
+        else:
+            _LOGGER.info(f"Passed through {request.path} ({status})")
+
+        return web.Response(body=body, status=status, content_type="application/json")
+
+    def _fixture(self, path: str) -> Path | None:
+        """Fixture file of an API path, api keys are never recorded"""
+        parts = path.strip("/").split("/")
+        if parts == ["rooftop_sites"]:
+            return self._path / "rooftop_sites.json"
+        if len(parts) == 3 and parts[0] == "rooftop_sites" and parts[2] in _ESTIMATES:
+            return self._path / parts[1] / f"{parts[2]}.json"
+        return None
+
+
+async def bench(args: argparse.Namespace) -> None:
+    """Time forecast refreshes against the stand-in"""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from custom_components.foxess_em.forecast.forecast_model import ForecastModel
+    from custom_components.foxess_em.forecast.solcast_api import SolcastApiClient
+
+    class Unlimited:
+        """Ledger which never refuses a call"""
+
+        async def async_acquire(self, calls: int = 1) -> bool:
+            return True
+
+    standin = StandIn(Fixtures(args.fixtures, args.sites, True), args)
+    runner = web.AppRunner(standin.app())
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+
+    timings = []
+    try:
+        async with ClientSession() as session:
+            api = SolcastApiClient("bench", f"http://{args.host}:{args.port}", session)
+            model = ForecastModel(api, Unlimited())
+            for _ in range(args.refreshes):
+                start = time.perf_counter()
+                try:
+                    await model.refresh()
+                    model.total_kwh_forecast_today()
+                    model.solar_forecast()
+                except Exception as ex:
+                    _LOGGER.warning(f"Refresh failed: {ex!r}")
+                    continue
+                timings.append(time.perf_counter() - start)
+    finally:
+        await runner.cleanup()
+
+    timings.sort()
+    if len(timings) > 0:
+        print(
+            f"{len(timings)}/{args.refreshes} refreshes of {args.sites} sites: "
+            f"p50 {timings[len(timings) // 2] * 1000:.1f}ms "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1000:.1f}ms "
+            f"max {timings[-1] * 1000:.1f}ms"
+        )
+    print(json.dumps(standin.stats()))
+
+
+def main() -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=["serve", "record", "bench"])
+    parser.add_argument("--fixtures", type=Path, help="fixture directory")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--upstream", default=_SOLCAST_URL, help="API to record")
+    parser.add_argument("--sites", type=int, default=1, help="sites to serve")
+    parser.add_argument("--no-shift", action="store_true", help="keep fixture times")
+    parser.add_argument("--latency", type=float, default=0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0, help="seconds")
+    parser.add_argument("--limit", type=int, help="daily estimate calls per key")
+    parser.add_argument("--rate-limit", type=float, default=0, help="429 ratio")
+    parser.add_argument("--error-rate", type=float, default=0, help="500 ratio")
+    parser.add_argument("--refreshes", type=int, default=10, help="bench refreshes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.mode == "bench":
+        asyncio.run(bench(args))
+    elif args.mode == "record":
+        if args.fixtures is None:
+            parser.error("record needs --fixtures")
+        app = Recorder(args.fixtures, args.upstream.rstrip("/")).app()
+        web.run_app(app, host=args.host, port=args.port)
+    else:
+        fixtures = Fixtures(args.fixtures, args.sites, not args.no_shift)
+        web.run_app(StandIn(fixtures, args).app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()